@@ -0,0 +1,142 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation import Simulation, DEFAULT_PARAMS
+from drivers import DRIVERS
+
+# Безголовый пакетный прогон игр для подбора сложности.
+# Пример: python src/batch_sim.py --games 100000 --set difficulty=0,1,2 \
+#         --set spawn_interval_ms=1500,2000 --driver lane_dodger --out sweep.npz
+# Множители скорости по типам машин задаются через двоеточие:
+#         --set speed_modifiers=0.9:1.0:1.1,0.8:1.0:1.2
+
+SWEEP_KEYS = ["difficulty", "speed_min", "speed_max", "spawn_interval_ms", "max_player_speed",
+              "speed_modifiers"]
+TASKS_PER_WORKER = 4
+MAX_CHUNK_SIZE = 2000
+
+
+def run_chunk(params, driver_name, seeds, dt, max_time):
+    driver = DRIVERS[driver_name]
+    scores = array("q")
+    survival = array("d")
+    sim = Simulation(params=params)
+    for seed in seeds:
+        sim.reset(seed)
+        rng = random.Random(seed ^ 0x5DEECE66D)
+        while not sim.crashed and sim.time < max_time:
+            sim.step(dt, *driver(sim, rng))
+        scores.append(sim.score)
+        survival.append(sim.time)
+    return scores, survival
+
+
+def chunk_size_for(total_games, workers):
+    # Несколько задач на процесс, чтобы все процессы были заняты до конца
+    # и неравные по длине куски выравнивались; не больше MAX_CHUNK_SIZE игр
+    return max(1, min(MAX_CHUNK_SIZE, math.ceil(total_games / (workers * TASKS_PER_WORKER))))
+
+
+def parse_grid(assignments):
+    grid = {}
+    for item in assignments:
+        key, _, values = item.partition("=")
+        if key not in SWEEP_KEYS:
+            raise SystemExit(f"Неизвестный параметр: {key} (доступны: {', '.join(SWEEP_KEYS)})")
+        if key == "speed_modifiers":
+            grid[key] = [[float(m) for m in v.split(":")] for v in values.split(",") if v]
+            if any(len(m) != len(DEFAULT_PARAMS[key]) for m in grid[key]):
+                raise SystemExit(f"speed_modifiers: нужно {len(DEFAULT_PARAMS[key])} "
+                                 f"значения через ':' для каждого варианта")
+            continue
+        cast = int if key in ("difficulty", "spawn_interval_ms") else float
+        grid[key] = [cast(v) for v in values.split(",") if v]
+    return grid
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(keys, values))
+        yield params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная симуляция Dark Racer")
+    parser.add_argument("--games", type=int, default=10000, help="игр на каждую точку сетки")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="lane_dodger")
+    parser.add_argument("--set", dest="grid", action="append", default=[],
+                        metavar="KEY=V1,V2", help="значения параметра для перебора")
+    parser.add_argument("--dt", type=float, default=0.016, help="шаг симуляции, с")
+    parser.add_argument("--max-time", type=float, default=600.0, help="лимит длительности игры, с")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="игр в одной задаче (0 - подобрать по числу процессов)")
+    parser.add_argument("--out", default="sweep.npz")
+    args = parser.parse_args()
+
+    import numpy as np
+
+    grid = parse_grid(args.grid)
+    combos = list(expand_grid(grid))
+    chunk_size = args.chunk_size or chunk_size_for(len(combos) * args.games, args.workers)
+    started = time.perf_counter()
+
+    # Крупные куски игр на процесс: накладные расходы на передачу малы,
+    # поэтому пропускная способность растет почти линейно с числом ядер
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for combo_index, params in enumerate(combos):
+            first_seed = args.seed + combo_index * args.games
+            for start in range(0, args.games, chunk_size):
+                seeds = range(first_seed + start,
+                              first_seed + min(start + chunk_size, args.games))
+                future = pool.submit(run_chunk, params, args.driver, seeds,
+                                     args.dt, args.max_time)
+                futures.append((combo_index, seeds, future))
+
+        combo_column = array("q")
+        seed_column = array("q")
+        scores = array("q")
+        survival = array("d")
+        for combo_index, seeds, future in futures:
+            chunk_scores, chunk_survival = future.result()
+            combo_column.extend([combo_index] * len(seeds))
+            seed_column.extend(seeds)
+            scores.extend(chunk_scores)
+            survival.extend(chunk_survival)
+
+    combo_index = np.frombuffer(combo_column, dtype=np.int64)
+    columns = {
+        "combo": combo_index,
+        "seed": np.frombuffer(seed_column, dtype=np.int64),
+        "score": np.frombuffer(scores, dtype=np.int64),
+        "survival_time": np.frombuffer(survival, dtype=np.float64),
+        "params": np.array([json.dumps(p) for p in combos]),
+    }
+    for key in SWEEP_KEYS:
+        columns[key] = np.array([p[key] for p in combos])[combo_index]
+    np.savez_compressed(args.out, **columns)
+
+    elapsed = time.perf_counter() - started
+    total = len(combos) * args.games
+    print(f"{total} игр за {elapsed:.1f} с ({total / elapsed:.0f} игр/с) -> {args.out}")
+    for i, params in enumerate(combos):
+        mask = combo_index == i
+        grid_values = ", ".join(f"{k}={params[k]}" for k in grid)
+        print(f"[{grid_values or 'по умолчанию'}] "
+              f"очки: медиана {np.median(columns['score'][mask]):.0f}, "
+              f"время: медиана {np.median(columns['survival_time'][mask]):.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT, CAR_WIDTH, CAR_HEIGHT
+
+# Скриптовые водители для безголовой симуляции.
+# Водитель - функция (sim, rng) -> (left, right, up, down).
+
+
+def idle_driver(sim, rng):
+    return False, False, False, False
+
+
+def random_driver(sim, rng):
+    move = rng.random()
+    return move < 0.2, move > 0.8, False, False
+
+
+def lane_dodger_driver(sim, rng, lookahead=SCREEN_HEIGHT * 0.6, step=30):
+    # Смещается к позиции, над которой ближайшая машина дальше всего
+    danger_top = sim.player_y - lookahead
+    nearby = [car for car in sim.cars if danger_top <= car.y < sim.player_y + CAR_HEIGHT]
+
+    def clearance(x):
+        return min((sim.player_y - car.y for car in nearby if abs(car.x - x) < CAR_WIDTH),
+                   default=float("inf"))
+
+    best_x = sim.player_x
+    best_clearance = clearance(best_x)
+    for x in range(0, SCREEN_WIDTH - CAR_WIDTH + 1, step):
+        candidate = clearance(x)
+        if candidate > best_clearance or (
+                candidate == best_clearance and abs(x - sim.player_x) < abs(best_x - sim.player_x)):
+            best_x, best_clearance = x, candidate
+
+    return sim.player_x > best_x + 5, sim.player_x < best_x - 5, False, False
+
+
+DRIVERS = {
+    "idle": idle_driver,
+    "random": random_driver,
+    "lane_dodger": lane_dodger_driver,
+}
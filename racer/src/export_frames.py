@@ -0,0 +1,150 @@
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Безголовый экспорт кадров сидированного заезда.
+# PNG: python src/export_frames.py --seed 7 --out frames/
+# Сырой RGB для кодировщика:
+#   python src/export_frames.py --format raw --out - | \
+#   ffmpeg -f rawvideo -pix_fmt rgb24 -s 600x600 -r 60 -i - run.mp4
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from drivers import DRIVERS
+
+
+def png_chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def encode_png(path, width, height, rgb, level):
+    # Выполняется в дочернем процессе: сжатие - самая дорогая часть экспорта
+    row_size = width * 3
+    raw = b"".join(b"\x00" + rgb[y * row_size:(y + 1) * row_size] for y in range(height))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(png_chunk(b"IDAT", zlib.compress(raw, level)))
+        f.write(png_chunk(b"IEND", b""))
+
+
+def image_rgb_bytes(image):
+    from PyQt6.QtGui import QImage
+
+    image = image.convertToFormat(QImage.Format.Format_RGB888)
+    data = image.constBits().asstring(image.sizeInBytes())
+    row_size = image.width() * 3
+    if image.bytesPerLine() == row_size:
+        return data
+    line = image.bytesPerLine()
+    return b"".join(data[y * line:y * line + row_size] for y in range(image.height()))
+
+
+# Представление виджета в виде, который ожидают скриптовые водители
+class WidgetDriverView:
+    def __init__(self, widget):
+        self.widget = widget
+
+    @property
+    def player_x(self):
+        return self.widget.player_car.x
+
+    @property
+    def player_y(self):
+        return self.widget.player_car.y
+
+    @property
+    def cars(self):
+        return self.widget.traffic_cars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт кадров заезда Dark Racer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", type=int, choices=[0, 1, 2], default=1)
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="lane_dodger")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=300.0, help="длительность, с")
+    parser.add_argument("--size", type=int, default=600, help="сторона кадра в пикселях")
+    parser.add_argument("--format", choices=["png", "raw"], default="png")
+    parser.add_argument("--out", default="frames", help="папка для PNG или файл/'-' для raw")
+    parser.add_argument("--restart", action="store_true",
+                        help="после аварии начинать новый заезд (для attract-режима)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--compress-level", type=int, default=6)
+    args = parser.parse_args()
+
+    from PyQt6.QtGui import QImage
+    from PyQt6.QtWidgets import QApplication
+    import main as game
+
+    app = QApplication(sys.argv[:1])
+    widget = game.GameWidget()
+    widget.difficulty = args.difficulty
+    widget.seed = args.seed
+    widget.start_new_game()
+    driver = DRIVERS[args.driver]
+    view = WidgetDriverView(widget)
+    rng = random.Random(args.seed)
+
+    frame = QImage(args.size, args.size, QImage.Format.Format_ARGB32_Premultiplied)
+    dt = 1.0 / args.fps
+    total_frames = int(args.duration * args.fps)
+    started = time.perf_counter()
+
+    if args.format == "png":
+        Path(args.out).mkdir(parents=True, exist_ok=True)
+        output = None
+    else:
+        output = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+
+    # Кадры рисуются в главном потоке, а PNG сжимаются пулом процессов;
+    # очередь ограничена, чтобы память не росла на длинных записях.
+    # Процессы запускаются через spawn: fork после старта Qt и потока
+    # подгрузки дороги может зависнуть
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        for index in range(total_frames):
+            if widget.game_state == game.GameState.PLAYING:
+                left, right, up, down = driver(view, rng)
+                widget.left_pressed, widget.right_pressed = left, right
+                widget.up_pressed, widget.down_pressed = up, down
+                widget.update_game_state(dt)
+            elif args.restart:
+                widget.seed += 1
+                widget.start_new_game()
+
+            widget.render_frame(frame)
+            rgb = image_rgb_bytes(frame)
+            if output is not None:
+                output.write(rgb)
+                continue
+
+            path = Path(args.out) / f"frame_{index:06d}.png"
+            in_flight.append(pool.submit(encode_png, str(path), args.size, args.size,
+                                         rgb, args.compress_level))
+            while len(in_flight) > args.workers * 4:
+                in_flight.popleft().result()
+        for future in in_flight:
+            future.result()
+
+    if output is not None and output is not sys.stdout.buffer:
+        output.close()
+    elapsed = time.perf_counter() - started
+    print(f"{total_frames} кадров за {elapsed:.1f} с ({total_frames / elapsed:.1f} кадр/с)",
+          file=sys.stderr)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
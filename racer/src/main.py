@@ -1,22 +1,36 @@
 import sys
-import random
 import json
+import itertools
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtGui import (QPainter, QColor, QFont, QImage, QPainterPath, 
-                         QPen, QLinearGradient, QConicalGradient, QCursor)
+                         QPen, QLinearGradient, QConicalGradient, QCursor, QPolygonF)
 from PyQt6.QtCore import Qt, QTimer, QRectF, QPointF, QElapsedTimer, QUrl, QPoint
 from PyQt6.QtWidgets import QApplication, QWidget, QInputDialog, QLineEdit
 from PyQt6.QtMultimedia import QSoundEffect, QMediaPlayer, QAudioOutput
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT,
+                        ROAD_SPEED_MULTIPLIER, ROAD_SCROLL_FACTOR, road_lane_width,
+                        SpawnScheduler, RoadGenerator, move_player, rects_intersect, spawn_blocked)
+from netplay import NetClient, MAX_PLAYERS
+from spectate import SpectatorServer
 
 # Константы игры
-SCREEN_WIDTH = 600
-SCREEN_HEIGHT = 600
-PLAYER_SPEED_INCREMENT = 0.1
-MAX_PLAYER_SPEED = 25.6
-TRAFFIC_CAR_SPEED_MIN = 5
-TRAFFIC_CAR_SPEED_MAX = 20
-NUM_LANES = 4
 HIGHSCORES_FILE = "highscores.json"
+ROAD_PREFETCH_CHUNKS = 3
+ROADSIDE_STRIP_WIDTH = 100
+SCREEN_RECT = QRectF(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+# Внутреннее разрешение отрисовки по качеству графики (доля от окна)
+RENDER_SCALES = [0.5, 0.75, 1.0]
+
+# Цвета процедурной дороги
+ASPHALT_COLOR = QColor(58, 58, 62)
+ROADSIDE_COLOR = QColor(125, 100, 85)
+BARRIER_COLOR = QColor(190, 190, 195)
+ROAD_EDGE_COLOR = QColor(230, 200, 60)
+ROAD_MARK_COLOR = QColor(235, 235, 235)
+TREE_COLOR = QColor(60, 110, 55)
+ROCK_COLOR = QColor(105, 90, 80)
 
 # Цветовая палитра
 DARK_GRAY = QColor(40, 40, 45)
@@ -54,6 +68,52 @@ class GameState:
     CONTROLS_SETTINGS = 7
     HIGHSCORES = 8
 
+# Спрайты декодируются один раз и масштабируются под текущее внутреннее
+# разрешение; при смене масштаба кэш перестраивается
+class SpriteCache:
+    def __init__(self):
+        self.sources = {}
+        self.scaled = {}
+        self.scale = 1.0
+
+    def set_scale(self, scale):
+        if scale != self.scale:
+            self.scale = scale
+            self.scaled.clear()
+
+    def source(self, path):
+        if path not in self.sources:
+            image = QImage(path)
+            if image.isNull():
+                print(f"Ошибка загрузки изображения {path}")
+            self.sources[path] = image
+        return self.sources[path]
+
+    def get(self, path, width, height):
+        key = (path, width, height)
+        if key not in self.scaled:
+            self.scaled[key] = self.source(path).scaled(
+                max(1, round(width * self.scale)), max(1, round(height * self.scale)),
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation)
+        return self.scaled[key]
+
+    def draw(self, painter, path, x, y, width, height):
+        image = self.get(path, width, height)
+        if not image.isNull():
+            painter.drawImage(QRectF(int(x), int(y), image.width() / self.scale,
+                                     image.height() / self.scale), image)
+
+
+sprite_cache = SpriteCache()
+
+PLAYER_CAR_IMAGE = "src/assets/images/player_car.png"
+TRAFFIC_CAR_IMAGES = [
+    "src/assets/images/enemy_car_1.png",
+    "src/assets/images/enemy_car_2.png",
+    "src/assets/images/enemy_car_3.png"
+]
+
 class PlayerCar:
     def __init__(self):
         self.width = 60
@@ -61,18 +121,16 @@ class PlayerCar:
         self.x = (SCREEN_WIDTH / 2) - (self.width / 2)
         self.y = SCREEN_HEIGHT - self.height - 20
         self.speed = 0
-        self.image = QImage("src/assets/images/player_car.png")
-        if self.image.isNull():
-            print("Ошибка: Не удалось загрузить изображение игрока")
 
     def get_rect(self):
         return QRectF(self.x, self.y, self.width, self.height)
 
     def draw(self, painter):
-        scaled_image = self.image.scaled(self.width, self.height,
-                                      Qt.AspectRatioMode.KeepAspectRatio,
-                                      Qt.TransformationMode.SmoothTransformation)
-        painter.drawImage(int(self.x), int(self.y), scaled_image)
+        sprite_cache.draw(painter, PLAYER_CAR_IMAGE, self.x, self.y, self.width, self.height)
+
+# Номера машин для трансляции зрителям
+car_serials = itertools.count(1)
+
 
 class TrafficCar:
     def __init__(self, x, y, base_speed, car_type):
@@ -81,16 +139,9 @@ class TrafficCar:
         self.x = x
         self.y = y
         self.base_speed = base_speed
-        
-        car_images = [
-            "src/assets/images/enemy_car_1.png",
-            "src/assets/images/enemy_car_2.png",
-            "src/assets/images/enemy_car_3.png"
-        ]
-        self.image = QImage(car_images[car_type])
-        
-        if self.image.isNull():
-            print(f"Ошибка загрузки изображения машины типа {car_type}")
+        self.car_type = car_type
+        self.serial = next(car_serials)
+        self.image_path = TRAFFIC_CAR_IMAGES[car_type]
 
     def update(self, dt, player_speed):
         effective_speed = self.base_speed + player_speed * 1.5
@@ -100,16 +151,140 @@ class TrafficCar:
         return QRectF(self.x, self.y, self.width, self.height)
 
     def draw(self, painter):
-        scaled_image = self.image.scaled(self.width, self.height,
-                                      Qt.AspectRatioMode.KeepAspectRatio,
-                                      Qt.TransformationMode.SmoothTransformation)
-        painter.drawImage(int(self.x), int(self.y), scaled_image)
+        sprite_cache.draw(painter, self.image_path, self.x, self.y, self.width, self.height)
+
+def render_road_chunk(chunk, left_strip, right_strip, scale=1.0):
+    image = QImage(max(1, round(SCREEN_WIDTH * scale)), max(1, round(SCREEN_HEIGHT * scale)),
+                   QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(ROADSIDE_COLOR)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.scale(scale, scale)
+
+    # Обочины: текстура из road.png или процедурная полоса с отбойником
+    margin = max(chunk.left_in, chunk.left_out)
+    if chunk.scenery == "signs" and left_strip is not None:
+        painter.drawImage(QRectF(int(margin) - ROADSIDE_STRIP_WIDTH, 0,
+                                 ROADSIDE_STRIP_WIDTH, SCREEN_HEIGHT), left_strip)
+        painter.drawImage(QRectF(SCREEN_WIDTH - int(margin), 0,
+                                 ROADSIDE_STRIP_WIDTH, SCREEN_HEIGHT), right_strip)
+    else:
+        painter.fillRect(QRectF(margin - 12, 0, 8, SCREEN_HEIGHT), BARRIER_COLOR)
+        painter.fillRect(QRectF(SCREEN_WIDTH - margin + 4, 0, 8, SCREEN_HEIGHT), BARRIER_COLOR)
+        painter.setPen(Qt.PenStyle.NoPen)
+        for left_side, y, variant in chunk.props:
+            if margin < 40:
+                break
+            x = (margin - 16) * variant if left_side else SCREEN_WIDTH - (margin - 16) * variant
+            if chunk.scenery == "trees":
+                painter.setBrush(TREE_COLOR)
+                painter.drawEllipse(QPointF(x, y), 14, 14)
+            else:
+                painter.setBrush(ROCK_COLOR)
+                painter.drawEllipse(QPointF(x, y), 6, 4)
+
+    # Полотно: трапеция от раскладки снизу к раскладке сверху
+    bottom_left, top_left = chunk.left_in, chunk.left_out
+    road = QPolygonF([QPointF(bottom_left, SCREEN_HEIGHT), QPointF(SCREEN_WIDTH - bottom_left, SCREEN_HEIGHT),
+                      QPointF(SCREEN_WIDTH - top_left, 0), QPointF(top_left, 0)])
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setBrush(ASPHALT_COLOR)
+    painter.drawPolygon(road)
+
+    painter.setPen(QPen(ROAD_EDGE_COLOR, 4))
+    painter.drawLine(QPointF(bottom_left + 8, SCREEN_HEIGHT), QPointF(top_left + 8, 0))
+    painter.drawLine(QPointF(SCREEN_WIDTH - bottom_left - 8, SCREEN_HEIGHT),
+                     QPointF(SCREEN_WIDTH - top_left - 8, 0))
+
+    # Разметка полос; при сужении и расширении линии сходятся к новой раскладке
+    mark_pen = QPen(ROAD_MARK_COLOR, 3)
+    mark_pen.setDashPattern([10, 10])
+    painter.setPen(mark_pen)
+    width_in, width_out = road_lane_width(chunk.lanes_in), road_lane_width(chunk.lanes_out)
+    for k in range(1, min(chunk.lanes_in, chunk.lanes_out)):
+        painter.drawLine(QPointF(bottom_left + k * width_in, SCREEN_HEIGHT),
+                         QPointF(top_left + k * width_out, 0))
+    painter.end()
+    return image
+
+
+# Дорога подгружается участками: ближайшие заранее рисуются в фоновом
+# потоке, пройденные выгружаются, так что память не растет со временем
+class RoadStream:
+    def __init__(self, road_image):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.road_image = road_image
+        self.generator = RoadGenerator()
+        self.images = {}
+        self.pending = {}
+        self.scale = None
+        self.set_scale(1.0)
+
+    def set_scale(self, scale):
+        # Участки и текстуры обочин рисуются в пикселях внутреннего буфера
+        if scale == self.scale:
+            return
+        self.scale = scale
+        if self.road_image is None or self.road_image.isNull():
+            self.left_strip = self.right_strip = None
+        else:
+            size = max(1, round(SCREEN_WIDTH * scale))
+            strip_width = round(ROADSIDE_STRIP_WIDTH * scale)
+            scaled = self.road_image.scaled(size, size,
+                                            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                                            Qt.TransformationMode.SmoothTransformation)
+            self.left_strip = scaled.copy(0, 0, strip_width, size)
+            self.right_strip = scaled.copy(size - strip_width, 0, strip_width, size)
+        self.reset(self.generator)
+
+    def reset(self, generator):
+        for future in self.pending.values():
+            future.cancel()
+        self.generator = generator
+        self.images = {}
+        self.pending = {}
+
+    def render(self, index):
+        return render_road_chunk(self.generator.chunk(index), self.left_strip,
+                                 self.right_strip, self.scale)
+
+    def update(self, distance):
+        first = int(distance // SCREEN_HEIGHT)
+        for index in [i for i in self.images if i < first]:
+            del self.images[index]
+        for index, future in list(self.pending.items()):
+            if index < first:
+                future.cancel()
+                del self.pending[index]
+            elif future.done():
+                self.images[index] = future.result()
+                del self.pending[index]
+
+        for index in range(first, first + 2 + ROAD_PREFETCH_CHUNKS):
+            if index not in self.images and index not in self.pending:
+                self.pending[index] = self.executor.submit(self.render, index)
+
+    def image(self, index):
+        if index not in self.images:
+            future = self.pending.pop(index, None)
+            self.images[index] = future.result() if future else self.render(index)
+        return self.images[index]
+
+    def draw(self, painter, distance):
+        first = int(distance // SCREEN_HEIGHT)
+        offset = int(distance - first * SCREEN_HEIGHT)
+        painter.drawImage(QRectF(0, offset, SCREEN_WIDTH, SCREEN_HEIGHT), self.image(first))
+        painter.drawImage(QRectF(0, offset - SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT),
+                          self.image(first + 1))
+
 
 class GameWidget(QWidget):
     def __init__(self):
         super().__init__()
-        self.setFixedSize(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.resize(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.setMinimumSize(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
         self.setWindowTitle("Dark Racer")
+        self.frame_buffer = QImage()
         self.init_game()
         self.setup_timers()
         self.load_resources()
@@ -122,9 +297,18 @@ class GameWidget(QWidget):
         self.score = 0
         self.player_car = PlayerCar()
         self.traffic_cars = []
+        self.sim_time = 0.0
+        self.spawner = SpawnScheduler()
+        self.road_distance = 0.0
+        self.road_generator = RoadGenerator()
+        self.net_client = None
+        self.net_cars = {}
+        self.remote_car = None
+        self.spectator = None
         self.music_volume = 50
         self.sound_volume = 70
         self.difficulty = 1
+        self.seed = None
         self.graphics_quality = 2
         self.auto_acceleration = True
         self.left_pressed = False
@@ -139,9 +323,6 @@ class GameWidget(QWidget):
         self.game_timer.start(16)
         self.elapsed_timer = QElapsedTimer()
         self.elapsed_timer.start()
-        self.spawn_traffic_timer = QTimer(self)
-        self.spawn_traffic_timer.timeout.connect(self.spawn_traffic_car)
-        self.spawn_traffic_timer_interval = 2000
 
     def load_resources(self):
         # Звуковые эффекты
@@ -174,7 +355,7 @@ class GameWidget(QWidget):
         
         # Дорожное полотно и фон меню
         self.road_offset = 0
-        self.road_speed_multiplier = 5
+        self.road_speed_multiplier = ROAD_SPEED_MULTIPLIER
         self.road_image = QImage("src/assets/images/road.png")
         if self.road_image.isNull():
             print("Ошибка загрузки дорожного полотна")
@@ -196,6 +377,8 @@ class GameWidget(QWidget):
             painter.drawImage(0, 0, darken)
             painter.end()
 
+        self.road_stream = RoadStream(self.scaled_road_image)
+
     def load_highscores(self):
         try:
             if Path(HIGHSCORES_FILE).exists():
@@ -240,31 +423,81 @@ class GameWidget(QWidget):
         self.road_offset += 1  # Для анимации фона в меню
         if self.game_state == GameState.PLAYING:
             self.update_game_state(delta_time)
+        elif self.net_client:
+            self.update_network_idle(delta_time)
+        if self.spectator:
+            self.spectator.publish(self.game_state, self.player_car.x, self.player_car.speed,
+                                   self.score, [(car.serial, car.x, car.y, car.car_type)
+                                                for car in self.traffic_cars])
         self.update()
 
+    def connect(self, host, port):
+        self.net_client = NetClient((host, port))
+        self.net_client.join()
+
+    def start_spectator(self, port):
+        server = SpectatorServer(port=port)
+        if server.start():
+            self.spectator = server
+
     def update_game_state(self, dt):
+        if self.net_client:
+            self.update_network(dt)
+            return
+        # Порядок тот же, что в simulation.Simulation.step
         self.update_player_position(dt)
         self.update_traffic(dt)
-        self.update_road_animation()
+        self.update_road_animation(dt)
+        self.update_spawns(dt)
+
+    def update_network(self, dt):
+        # Сетевой режим: своя машина предсказывается клиентом,
+        # трафик и соперник приходят с сервера
+        client = self.net_client
+        client.update(dt, self.left_pressed, self.right_pressed, self.up_pressed, self.down_pressed)
+        if not client.in_race:
+            # Ждем, пока соперник тоже нажмет старт: машина стоит на старте
+            self.remote_car = None
+            return
+        if self.road_generator.seed != client.road_seed:
+            self.road_generator = RoadGenerator(client.road_seed)
+            self.road_stream.reset(self.road_generator)
+            self.road_distance = 0.0
+
+        self.player_car.x = client.player_x
+        self.player_car.speed = client.player_speed
+        self.score = client.score
+        # Машины переиспользуются по номеру на сервере, чтобы не менялись их номера для зрителей
+        cars = {}
+        for car_id, car in client.car_items():
+            traffic_car = self.net_cars.get(car_id)
+            if traffic_car is None:
+                traffic_car = TrafficCar(car.x, car.y, car.base_speed, car.car_type)
+            traffic_car.x, traffic_car.y = car.x, car.y
+            cars[car_id] = traffic_car
+        self.net_cars = cars
+        self.traffic_cars = list(cars.values())
+        self.remote_car = client.remote
+        self.handle_sound_effects()
+        # Дорога едет по предсказанию клиента: по ней же ограничен игрок
+        self.road_distance = client.road_distance
+        self.road_stream.update(self.road_distance)
+
+        if client.crashed:
+            self.play_sound('crash')
+            self.handle_game_over()
+
+    def update_network_idle(self, dt):
+        # Вне заезда клиент продолжает читать снимки и подтверждать их,
+        # иначе сервер перейдет на полные снимки; ввод при этом не отправляется
+        self.net_client.update(dt, False, False, False, False)
 
     def update_player_position(self, dt):
-        if self.left_pressed:
-            self.player_car.x = max(0, self.player_car.x - 300 * dt)
-        if self.right_pressed:
-            self.player_car.x = min(SCREEN_WIDTH - self.player_car.width, 
-                                  self.player_car.x + 300 * dt)
-        
-        if not self.auto_acceleration:
-            if self.up_pressed:
-                self.player_car.speed = min(MAX_PLAYER_SPEED, 
-                                          self.player_car.speed + PLAYER_SPEED_INCREMENT * dt * 60)
-            if self.down_pressed:
-                self.player_car.speed = max(0, 
-                                          self.player_car.speed - PLAYER_SPEED_INCREMENT * dt * 60)
-        else:
-            self.player_car.speed = min(MAX_PLAYER_SPEED, 
-                                      self.player_car.speed + PLAYER_SPEED_INCREMENT * dt * 30)
-        
+        self.player_car.x, self.player_car.speed = move_player(
+            self.player_car.x, self.player_car.speed, dt,
+            self.left_pressed, self.right_pressed, self.up_pressed, self.down_pressed,
+            auto_acceleration=self.auto_acceleration,
+            bounds=self.road_generator.player_bounds(self.road_distance))
         self.handle_sound_effects()
 
     def handle_sound_effects(self):
@@ -293,57 +526,45 @@ class GameWidget(QWidget):
                 cars_to_remove.append(car)
                 self.score += 10
                 
-            if self.player_car.get_rect().intersects(car.get_rect()):
+            if rects_intersect(self.player_car.x, self.player_car.y, car.x, car.y):
                 self.play_sound('crash')
                 self.handle_game_over()
                 
         for car in cars_to_remove:
             self.traffic_cars.remove(car)
 
-    def update_road_animation(self):
-        if self.scaled_road_image and not self.scaled_road_image.isNull():
-            self.road_offset += (self.road_speed_multiplier + self.player_car.speed) * 0.06
-            self.road_offset %= SCREEN_HEIGHT
+    def update_road_animation(self, dt):
+        self.road_distance += ((self.road_speed_multiplier + self.player_car.speed)
+                               * ROAD_SCROLL_FACTOR * dt * 60)
+        self.road_stream.update(self.road_distance)
 
-    def spawn_traffic_car(self):
+    def update_spawns(self, dt):
+        self.sim_time += dt
+        for event in self.spawner.pop_due(self.sim_time):
+            self.spawn_traffic_car(event)
+
+    def spawn_traffic_car(self, event):
         if self.game_state != GameState.PLAYING:
             return
-        
-        lane_index = random.randint(0, NUM_LANES - 1)
-        lane_center = (SCREEN_WIDTH / NUM_LANES) * (lane_index + 0.5)
-        x_pos = lane_center - 25
     
-        car_type = random.randint(0, 2)
-        base_speed = self.get_traffic_speed()
-        speed_modifiers = [0.9, 1.0, 1.1]
-        speed = base_speed * speed_modifiers[car_type]
-    
-        if not any(abs(car.x - x_pos) < 50 and car.y < 150 for car in self.traffic_cars):
-            self.traffic_cars.append(TrafficCar(x_pos, -80, speed, car_type))
-
-    def get_traffic_speed(self):
-        base_min = TRAFFIC_CAR_SPEED_MIN
-        base_max = TRAFFIC_CAR_SPEED_MAX
-    
-        if self.difficulty == 0:
-            return random.uniform(base_min, base_min + (base_max - base_min) * 0.5)
-        elif self.difficulty == 1:
-            return random.uniform(base_min, base_max)
-        else:
-            return random.uniform(base_min + (base_max - base_min) * 0.5, base_max + 2)
+        # Машина появляется там, где ее проверил планировщик (event.x)
+        if not spawn_blocked(self.traffic_cars, event.x):
+            self.traffic_cars.append(TrafficCar(event.x, -80, event.speed, event.car_type))
 
     def handle_game_over(self):
         self.game_state = GameState.GAME_OVER
-        self.spawn_traffic_timer.stop()
         self.background_music.stop()
     
         if self.check_highscore(self.score):
             QTimer.singleShot(100, self.show_highscore_dialog)
 
     def show_highscore_dialog(self):
+        # Результат запоминается: в сетевой игре новый заезд может начаться,
+        # пока диалог открыт
+        score = self.score
         dialog = QInputDialog(self)
         dialog.setWindowTitle('Новый рекорд!')
-        dialog.setLabelText(f'Ваш результат: {self.score}\nВведите ваше имя:')
+        dialog.setLabelText(f'Ваш результат: {score}\nВведите ваше имя:')
         dialog.setTextValue('')
         dialog.setInputMode(QInputDialog.InputMode.TextInput)
         
@@ -353,14 +574,17 @@ class GameWidget(QWidget):
         
         ok = dialog.exec()
         name = dialog.textValue()
+        dialog.deleteLater()
         
         if ok and name:
-            self.add_highscore(name, self.score)
+            self.add_highscore(name, score)
 
     def start_new_game(self):
+        if self.net_client:
+            # Сетевой заезд начинает сервер, когда старт нажали оба игрока
+            self.net_client.request_start()
         self.game_state = GameState.PLAYING
         self.reset_game()
-        self.spawn_traffic_timer.start(self.spawn_traffic_timer_interval)
         self.background_music.setLoops(QMediaPlayer.Loops.Infinite)
         self.background_music.play()
 
@@ -368,6 +592,11 @@ class GameWidget(QWidget):
         self.score = 0
         self.player_car = PlayerCar()
         self.traffic_cars = []
+        self.sim_time = 0.0
+        self.road_generator = RoadGenerator(self.seed)
+        self.spawner = SpawnScheduler(self.difficulty, self.seed, road=self.road_generator)
+        self.road_distance = 0.0
+        self.road_stream.reset(self.road_generator)
         self.road_offset = 0
         self.elapsed_timer.restart()
 
@@ -387,7 +616,7 @@ class GameWidget(QWidget):
             painter.drawImage(0, int(self.road_offset % SCREEN_HEIGHT), self.scaled_menu_bg)
             painter.drawImage(0, int(self.road_offset % SCREEN_HEIGHT) - SCREEN_HEIGHT, self.scaled_menu_bg)
         
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 160))
+        painter.fillRect(SCREEN_RECT, QColor(0, 0, 0, 160))
         
         if title:
             painter.setFont(QFont("Segoe UI", 28, QFont.Weight.Bold))
@@ -435,8 +664,7 @@ class GameWidget(QWidget):
                          start_y + i * (button_height + spacing),
                          button_width, button_height)
             
-            mouse_pos = self.mapFromGlobal(QCursor.pos())
-            mouse_pos_f = QPointF(mouse_pos)  # Преобразуем QPoint в QPointF
+            mouse_pos_f = self.to_logical(QPointF(self.mapFromGlobal(QCursor.pos())))
             hover = rect.contains(mouse_pos_f)
             pressed = hover and QApplication.mouseButtons() == Qt.MouseButton.LeftButton
             
@@ -446,8 +674,7 @@ class GameWidget(QWidget):
 
     def draw_back_button(self, painter):
         back_rect = QRectF(20, SCREEN_HEIGHT - 70, 100, 40)
-        mouse_pos = self.mapFromGlobal(QCursor.pos())
-        mouse_pos_f = QPointF(mouse_pos)  # Преобразуем QPoint в QPointF
+        mouse_pos_f = self.to_logical(QPointF(self.mapFromGlobal(QCursor.pos())))
         hover = back_rect.contains(mouse_pos_f)
         pressed = hover and QApplication.mouseButtons() == Qt.MouseButton.LeftButton
         self.draw_button(painter, back_rect, "Назад", MEDIUM_GRAY, hover, pressed)
@@ -566,7 +793,7 @@ class GameWidget(QWidget):
         self.draw_back_button(painter)
 
     def draw_game_over(self, painter):
-        painter.fillRect(self.rect(), QColor(0, 0, 0, 180))
+        painter.fillRect(SCREEN_RECT, QColor(0, 0, 0, 180))
         
         painter.setFont(QFont("Segoe UI", 36, QFont.Weight.Bold))
         painter.setPen(Qt.GlobalColor.red)
@@ -601,13 +828,13 @@ class GameWidget(QWidget):
         self.draw_button(painter, menu_rect, "ГЛАВНОЕ МЕНЮ")
 
     def draw_game(self, painter):
-        if self.scaled_road_image:
-            painter.drawImage(0, int(self.road_offset), self.scaled_road_image)
-            painter.drawImage(0, int(self.road_offset - SCREEN_HEIGHT), self.scaled_road_image)
-        else:
-            painter.fillRect(self.rect(), DARK_GRAY)
+        self.road_stream.draw(painter, self.road_distance)
         
         self.player_car.draw(painter)
+        if self.remote_car:
+            x, y = self.remote_car
+            sprite_cache.draw(painter, PLAYER_CAR_IMAGE, x, y,
+                              self.player_car.width, self.player_car.height)
         for car in self.traffic_cars:
             car.draw(painter)
         
@@ -615,9 +842,46 @@ class GameWidget(QWidget):
         painter.setPen(TEXT_COLOR)
         painter.drawText(10, 30, f"СЧЕТ: {self.score}")
         painter.drawText(10, 60, f"СКОРОСТЬ: {int(self.player_car.speed * 10)} КМ/Ч")
+        if self.net_client and not self.net_client.in_race:
+            _, ready = self.net_client.lobby
+            painter.drawText(QRectF(0, 220, SCREEN_WIDTH, 40), Qt.AlignmentFlag.AlignCenter,
+                             f"ОЖИДАНИЕ СОПЕРНИКА: ГОТОВО {ready} ИЗ {MAX_PLAYERS}")
+
+    def viewport_rect(self):
+        # Квадратная область игры по центру окна, логика всегда в 600x600
+        side = min(self.width(), self.height())
+        return QRectF((self.width() - side) / 2, (self.height() - side) / 2, side, side)
+
+    def to_logical(self, pos):
+        viewport = self.viewport_rect()
+        return QPointF((pos.x() - viewport.x()) * SCREEN_WIDTH / viewport.width(),
+                       (pos.y() - viewport.y()) * SCREEN_HEIGHT / viewport.height())
 
     def paintEvent(self, event):
+        viewport = self.viewport_rect()
+        scale = RENDER_SCALES[self.graphics_quality]
+        size = max(1, round(viewport.width() * self.devicePixelRatioF() * scale))
+        if self.frame_buffer.width() != size:
+            self.frame_buffer = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+        self.render_frame(self.frame_buffer)
+
         painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawImage(viewport, self.frame_buffer)
+
+    def render_frame(self, image):
+        scale = image.width() / SCREEN_WIDTH
+        sprite_cache.set_scale(scale)
+        self.road_stream.set_scale(scale)
+
+        image.fill(Qt.GlobalColor.black)
+        painter = QPainter(image)
+        painter.scale(scale, image.height() / SCREEN_HEIGHT)
+        self.draw_frame(painter)
+        painter.end()
+
+    def draw_frame(self, painter):
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setFont(self.custom_font)
         
@@ -683,8 +947,7 @@ class GameWidget(QWidget):
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
-            pos = event.pos()
-            pos_f = QPointF(pos)  # Преобразуем QPoint в QPointF
+            pos_f = self.to_logical(event.position())
             
             if self.game_state == GameState.GAME_OVER:
                 self.handle_game_over_click(pos_f)
@@ -854,5 +1117,10 @@ class GameWidget(QWidget):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     game = GameWidget()
+    if "--connect" in sys.argv:
+        host, port = sys.argv[sys.argv.index("--connect") + 1].rsplit(":", 1)
+        game.connect(host, int(port))
+    if "--spectate" in sys.argv:
+        game.start_spectator(int(sys.argv[sys.argv.index("--spectate") + 1]))
     game.show()
     sys.exit(app.exec())
\ No newline at end of file
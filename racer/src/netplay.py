@@ -0,0 +1,704 @@
+import argparse
+import heapq
+import random
+import socket
+import struct
+import time
+from collections import Counter, deque
+from multiprocessing import Process
+
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT, CAR_WIDTH, CAR_HEIGHT, DEFAULT_PARAMS,
+                        ROAD_SPEED_MULTIPLIER, ROAD_SCROLL_FACTOR,
+                        SpawnScheduler, RoadGenerator, SimCar, move_player)
+
+# Сетевая игра вдвоем по локальной сети. Сервер авторитетен: он принимает
+# ввод обоих игроков каждый тик и рассылает снимки состояния, сжатые
+# относительно последнего подтвержденного клиентом тика. Клиент предсказывает
+# свою машину и сверяется со снимками, машину соперника интерполирует.
+# Заезд начинается, когда оба игрока подключились и нажали старт: до этого
+# сервер рассылает только состояние лобби и не двигает игроков.
+#
+# Сервер:  python src/netplay.py server --port 7777
+# Клиент:  python src/main.py --connect 127.0.0.1:7777
+# Замер:   python src/netplay.py bench --loss 0.05 --delay 0.04 --jitter 0.01
+
+NET_TICK_RATE = 60
+NET_DT = 1.0 / NET_TICK_RATE
+MAX_PLAYERS = 2
+HISTORY_TICKS = 64
+MAX_INPUTS_PER_PACKET = 16
+INTERPOLATION_TICKS = 6
+MATCH_RESTART_SECONDS = 3
+JOIN_TIMEOUT_SECONDS = 5
+READY_RESEND_SECONDS = 0.2
+
+# Мировая координата вдоль дороги: игрок едет вперед, трафик навстречу.
+# Экранная y машины для игрока: PLAYER_Y - (дистанция машины - дистанция игрока)
+PLAYER_Y = SCREEN_HEIGHT - CAR_HEIGHT - 20
+PASS_DISTANCE = SCREEN_HEIGHT - PLAYER_Y
+SPAWN_DISTANCE = PLAYER_Y + 80
+
+MSG_JOIN, MSG_WELCOME, MSG_INPUT, MSG_SNAPSHOT, MSG_READY, MSG_LOBBY = range(6)
+
+INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN = 1, 2, 4, 8
+FIELD_X, FIELD_SPEED, FIELD_DISTANCE, FIELD_SCORE, FIELD_CRASHED, FIELD_ROAD = 1, 2, 4, 8, 16, 32
+
+JOIN = struct.Struct("<B")
+WELCOME = struct.Struct("<BBI")
+INPUT_HEADER = struct.Struct("<BBIIB")  # вид, заезд, подтвержденный тик, номер ввода, число вводов
+READY = struct.Struct("<BB")            # вид, заезд
+LOBBY = struct.Struct("<BBBB")          # вид, заезд, подключено, готово
+SNAPSHOT_HEADER = struct.Struct("<BBIIIB")
+PLAYER_HEADER = struct.Struct("<BB")
+PLAYER_FIELDS = [(FIELD_X, struct.Struct("<f")), (FIELD_SPEED, struct.Struct("<f")),
+                 (FIELD_DISTANCE, struct.Struct("<d")), (FIELD_SCORE, struct.Struct("<I")),
+                 (FIELD_CRASHED, struct.Struct("<B")), (FIELD_ROAD, struct.Struct("<f"))]
+EMPTY_FIELDS = (0.0, 0.0, 0.0, 0, 0, 0.0)
+COUNT = struct.Struct("<H")
+CAR_ID = struct.Struct("<H")
+CAR_ADDED = struct.Struct("<HfdfBI")
+
+
+def is_newer_match(match, current):
+    # Номер заезда идет по кругу; запоздавшие пакеты прошлых заездов отбрасываются
+    return match != current and (match - current) % 256 < 128
+
+
+def pack_input(left, right, up, down):
+    return ((INPUT_LEFT if left else 0) | (INPUT_RIGHT if right else 0)
+            | (INPUT_UP if up else 0) | (INPUT_DOWN if down else 0))
+
+
+def unpack_input(bits):
+    return (bool(bits & INPUT_LEFT), bool(bits & INPUT_RIGHT),
+            bool(bits & INPUT_UP), bool(bits & INPUT_DOWN))
+
+
+# UDP с имитацией потерь, задержки и джиттера (нулевые значения - обычная отправка)
+class Link:
+    def __init__(self, sock, loss=0.0, delay=0.0, jitter=0.0, rng=None):
+        self.sock = sock
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.queue = []
+        self.sequence = 0
+        self.bytes_sent = 0
+        self.packets_sent = 0
+        self.packets_dropped = 0
+
+    def sendto(self, data, address):
+        self.bytes_sent += len(data)
+        self.packets_sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.packets_dropped += 1
+            return
+        if not self.delay and not self.jitter:
+            self.sock.sendto(data, address)
+            return
+        release = time.perf_counter() + self.delay + self.rng.uniform(0, self.jitter)
+        heapq.heappush(self.queue, (release, self.sequence, data, address))
+        self.sequence += 1
+
+    def poll(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.sock.sendto(data, address)
+
+
+class NetPlayer:
+    __slots__ = ("x", "speed", "distance", "score", "crashed", "road_distance")
+
+    def __init__(self, x=(SCREEN_WIDTH - CAR_WIDTH) / 2, speed=0.0, distance=0.0, score=0, crashed=False,
+                 road_distance=0.0):
+        self.x = x
+        self.speed = speed
+        self.distance = distance
+        self.score = score
+        self.crashed = bool(crashed)
+        self.road_distance = road_distance
+
+    def apply_input(self, bits, max_speed, road):
+        # Тот же порядок, что в Simulation.step: игрок в пределах асфальта, затем дорога
+        if self.crashed:
+            return
+        left, right, up, down = unpack_input(bits)
+        self.x, self.speed = move_player(self.x, self.speed, NET_DT, left, right, up, down, max_speed,
+                                         bounds=road.player_bounds(self.road_distance))
+        self.distance += self.speed * 1.5 * 60 * NET_DT
+        self.road_distance += (ROAD_SPEED_MULTIPLIER + self.speed) * ROAD_SCROLL_FACTOR * NET_DT * 60
+
+    def fields(self):
+        return (self.x, self.speed, self.distance, self.score, int(self.crashed), self.road_distance)
+
+
+# Трафик движется детерминированно, поэтому машина передается один раз
+# при появлении, а положение в любой тик вычисляется на обеих сторонах
+class NetCar:
+    __slots__ = ("id", "x", "start_distance", "speed", "car_type", "spawn_tick")
+
+    def __init__(self, car_id, x, start_distance, speed, car_type, spawn_tick):
+        self.id = car_id
+        self.x = x
+        self.start_distance = start_distance
+        self.speed = speed
+        self.car_type = car_type
+        self.spawn_tick = spawn_tick
+
+    def distance(self, tick):
+        return self.start_distance - self.speed * 60 * NET_DT * (tick - self.spawn_tick)
+
+
+class DuelWorld:
+    def __init__(self, seed, difficulty=1, params=None):
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.difficulty = difficulty
+        self.players = {}
+        self.reset(seed)
+
+    def reset(self, seed):
+        self.road = RoadGenerator(seed)
+        self.spawner = SpawnScheduler(self.difficulty, seed, self.params, self.road)
+        self.players = {pid: NetPlayer() for pid in self.players}
+        self.cars = {}
+        self.passed = {}
+        self.next_car_id = 1
+        self.tick = 0
+
+    def add_player(self, pid):
+        self.players[pid] = NetPlayer()
+
+    def apply_input(self, pid, bits):
+        self.players[pid].apply_input(bits, self.params["max_player_speed"], self.road)
+
+    def step(self):
+        self.tick += 1
+        alive = {pid: p for pid, p in self.players.items() if not p.crashed}
+        # Машины убираются за последним живым игроком: разбившийся стоит на месте,
+        # и по нему трафик копился бы без предела
+        tail = min((p.distance for p in alive.values()), default=None)
+
+        for car in list(self.cars.values()):
+            distance = car.distance(self.tick)
+            for pid, player in alive.items():
+                relative = distance - player.distance
+                if relative < -PASS_DISTANCE and pid not in self.passed[car.id]:
+                    self.passed[car.id].add(pid)
+                    player.score += 10
+                if abs(car.x - player.x) < CAR_WIDTH and abs(relative) < CAR_HEIGHT:
+                    player.crashed = True
+            if tail is not None and distance < tail - PASS_DISTANCE:
+                del self.cars[car.id]
+                del self.passed[car.id]
+
+        if not self.players:
+            return
+        # Трафик появляется у верхнего края экрана лидера
+        lead = max(p.distance for p in self.players.values())
+        for event in self.spawner.pop_due(self.tick * NET_DT):
+            top = lead + PLAYER_Y - 150
+            if any(abs(car.x - event.x) < 50 and car.distance(self.tick) > top
+                   for car in self.cars.values()):
+                continue
+            car = NetCar(self.next_car_id, event.x, lead + SPAWN_DISTANCE, event.speed,
+                         event.car_type, self.tick)
+            self.cars[car.id] = car
+            self.passed[car.id] = set()
+            self.next_car_id = self.next_car_id % 65535 + 1
+
+    def snapshot(self):
+        return ({pid: p.fields() for pid, p in self.players.items()}, frozenset(self.cars))
+
+    def match_over(self):
+        return bool(self.players) and all(p.crashed for p in self.players.values())
+
+
+def encode_snapshot(world, match, base_tick, base, last_input_seq):
+    players, car_ids = world.snapshot()
+    base_players, base_cars = base if base else ({}, frozenset())
+    parts = [SNAPSHOT_HEADER.pack(MSG_SNAPSHOT, match, world.tick, base_tick if base else 0,
+                                  last_input_seq, len(players))]
+    for pid, fields in players.items():
+        old = base_players.get(pid)
+        mask = 0
+        values = []
+        for index, (flag, packer) in enumerate(PLAYER_FIELDS):
+            value = fields[index]
+            if old is None or old[index] != value:
+                mask |= flag
+                values.append(packer.pack(value))
+        parts.append(PLAYER_HEADER.pack(pid, mask))
+        parts.extend(values)
+
+    removed = base_cars - car_ids
+    added = car_ids - base_cars
+    parts.append(COUNT.pack(len(removed)))
+    parts.extend(CAR_ID.pack(car_id) for car_id in removed)
+    parts.append(COUNT.pack(len(added)))
+    for car_id in added:
+        car = world.cars[car_id]
+        parts.append(CAR_ADDED.pack(car.id, car.x, car.start_distance, car.speed,
+                                    car.car_type, car.spawn_tick))
+    return b"".join(parts)
+
+
+def decode_snapshot(data, states):
+    _, match, tick, base_tick, last_input_seq, player_count = SNAPSHOT_HEADER.unpack_from(data)
+    if base_tick:
+        if base_tick not in states:
+            return None
+        base_players, base_cars = states[base_tick]
+    else:
+        base_players, base_cars = {}, {}
+
+    offset = SNAPSHOT_HEADER.size
+    players = {}
+    for _ in range(player_count):
+        pid, mask = PLAYER_HEADER.unpack_from(data, offset)
+        offset += PLAYER_HEADER.size
+        fields = list(base_players.get(pid, EMPTY_FIELDS))
+        for index, (flag, packer) in enumerate(PLAYER_FIELDS):
+            if mask & flag:
+                fields[index] = packer.unpack_from(data, offset)[0]
+                offset += packer.size
+        players[pid] = tuple(fields)
+
+    cars = dict(base_cars)
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        cars.pop(CAR_ID.unpack_from(data, offset)[0], None)
+        offset += CAR_ID.size
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        car = NetCar(*CAR_ADDED.unpack_from(data, offset))
+        cars[car.id] = car
+        offset += CAR_ADDED.size
+    return match, tick, last_input_seq, players, cars
+
+
+class ServerClient:
+    def __init__(self, pid):
+        self.pid = pid
+        self.ack_tick = 0
+        self.last_input_seq = 0
+        self.ready = False
+
+
+def run_server(port, seed=0, difficulty=1, host="127.0.0.1", loss=0.0, delay=0.0, jitter=0.0,
+               duration=None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    link = Link(sock, loss, delay, jitter, random.Random(seed ^ 0xBEEF))
+
+    world = DuelWorld(seed, difficulty)
+    clients = {}
+    history = {}
+    match = 0
+    racing = False
+    over_since = None
+    started = time.perf_counter()
+    next_tick = started
+
+    while duration is None or time.perf_counter() - started < duration:
+        link.poll()
+        while True:
+            try:
+                data, address = sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            # Порт открыт наружу: пустые и обрезанные пакеты пропускаются
+            if not data:
+                continue
+            if data[0] == MSG_JOIN:
+                if address not in clients and len(clients) < MAX_PLAYERS:
+                    clients[address] = ServerClient(len(clients))
+                    world.add_player(clients[address].pid)
+                if address in clients:
+                    link.sendto(WELCOME.pack(MSG_WELCOME, clients[address].pid, seed), address)
+            elif data[0] == MSG_READY and address in clients:
+                try:
+                    _, ready_match = READY.unpack(data)
+                except struct.error:
+                    continue
+                if ready_match == match and not racing:
+                    clients[address].ready = True
+            elif data[0] == MSG_INPUT and address in clients:
+                client = clients[address]
+                try:
+                    _, input_match, ack_tick, newest_seq, count = INPUT_HEADER.unpack_from(data)
+                except struct.error:
+                    continue
+                # Ввод вне заезда и запоздавшие пакеты прошлого заезда не учитываются
+                if not racing or input_match != match:
+                    continue
+                client.ack_tick = max(client.ack_tick, ack_tick)
+                # Повторы последних вводов в каждом пакете прикрывают потери
+                for i, bits in enumerate(data[INPUT_HEADER.size:INPUT_HEADER.size + count]):
+                    seq = newest_seq - count + 1 + i
+                    if seq > client.last_input_seq:
+                        world.apply_input(client.pid, bits)
+                        client.last_input_seq = seq
+
+        now = time.perf_counter()
+        if now < next_tick:
+            time.sleep(min(next_tick - now, 0.001))
+            continue
+        next_tick += NET_DT
+
+        if not racing:
+            if len(clients) == MAX_PLAYERS and all(c.ready for c in clients.values()):
+                # Оба игрока стартуют одновременно с нулевой дистанции
+                racing = True
+                world.reset(seed + match)
+                history.clear()
+                for client in clients.values():
+                    client.ack_tick = 0
+            else:
+                ready = sum(c.ready for c in clients.values())
+                for address in clients:
+                    link.sendto(LOBBY.pack(MSG_LOBBY, match, len(clients), ready), address)
+                continue
+
+        world.step()
+        history[world.tick] = world.snapshot()
+        history.pop(world.tick - HISTORY_TICKS, None)
+        for address, client in clients.items():
+            base = history.get(client.ack_tick) if client.ack_tick < world.tick else None
+            link.sendto(encode_snapshot(world, match, client.ack_tick, base,
+                                        client.last_input_seq), address)
+
+        if world.match_over():
+            over_since = over_since or now
+            if now - over_since > MATCH_RESTART_SECONDS:
+                # Следующий заезд ждет готовности обоих игроков
+                match = (match + 1) % 256
+                racing = False
+                for client in clients.values():
+                    client.ready = False
+                over_since = None
+    sock.close()
+
+
+class NetClient:
+    def __init__(self, server_address, link_options=None):
+        self.server_address = server_address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("0.0.0.0", 0))
+        self.sock.setblocking(False)
+        self.link = Link(self.sock, **(link_options or {}))
+        self.player_id = None
+        self.seed = 0
+        self.max_speed = DEFAULT_PARAMS["max_player_speed"]
+        self.accumulator = 0.0
+        self.input_seq = 0
+        self.ready_match = None
+        self.next_ready = 0.0
+        self.bytes_received = 0
+        self.send_times = {}
+        self.latencies = []
+        self.corrections = []
+        self.snapshot_kinds = Counter()
+        self.reset_match(0)
+
+    def reset_match(self, match):
+        self.match = match
+        self.started = False
+        self.lobby = (0, 0)
+        self.states = {}
+        self.latest_tick = 0
+        self.render_tick = 0
+        self.pending = deque()
+        self.road = RoadGenerator(self.seed + match)
+        self.predicted = NetPlayer()
+        self.server_players = {}
+        self.remote_history = deque(maxlen=HISTORY_TICKS)
+
+    def join(self, timeout=JOIN_TIMEOUT_SECONDS):
+        deadline = time.perf_counter() + timeout
+        next_attempt = 0.0
+        while self.player_id is None:
+            now = time.perf_counter()
+            if now > deadline:
+                raise TimeoutError(f"Сервер {self.server_address} не отвечает")
+            if now >= next_attempt:
+                self.link.sendto(JOIN.pack(MSG_JOIN), self.server_address)
+                next_attempt = now + 0.2
+            self.poll()
+            time.sleep(0.005)
+        return self.player_id
+
+    def request_start(self):
+        # Готовность к ближайшему заезду, который еще не начался
+        self.ready_match = (self.match + 1) % 256 if self.started else self.match
+        self.next_ready = 0.0
+
+    @property
+    def in_race(self):
+        return self.started and self.match == self.ready_match
+
+    def update(self, dt, left, right, up, down):
+        self.poll()
+        now = time.perf_counter()
+        if not self.in_race and self.ready_match is not None and now >= self.next_ready:
+            # Готовность повторяется, пока сервер не начнет заезд
+            self.link.sendto(READY.pack(MSG_READY, self.ready_match), self.server_address)
+            self.next_ready = now + READY_RESEND_SECONDS
+        self.accumulator += dt
+        while self.accumulator >= NET_DT:
+            self.accumulator -= NET_DT
+            if self.in_race and not self.crashed:
+                self.send_input(pack_input(left, right, up, down))
+            elif self.started:
+                # Заезд идет без этого игрока: только подтверждение снимков, без ввода
+                self.send_ack()
+
+    def send_ack(self):
+        self.render_tick += 1
+        self.link.sendto(INPUT_HEADER.pack(MSG_INPUT, self.match, self.latest_tick, self.input_seq, 0),
+                         self.server_address)
+
+    def send_input(self, bits):
+        self.input_seq += 1
+        self.pending.append((self.input_seq, bits))
+        self.predicted.apply_input(bits, self.max_speed, self.road)
+        self.render_tick += 1
+
+        recent = list(self.pending)[-MAX_INPUTS_PER_PACKET:]
+        packet = INPUT_HEADER.pack(MSG_INPUT, self.match, self.latest_tick, self.input_seq, len(recent))
+        self.link.sendto(packet + bytes(b for _, b in recent), self.server_address)
+        self.send_times[self.input_seq] = time.perf_counter()
+
+    def poll(self):
+        self.link.poll()
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(65536)
+            except (BlockingIOError, ConnectionResetError):
+                break
+            self.bytes_received += len(data)
+            if not data:
+                continue
+            try:
+                if data[0] == MSG_WELCOME:
+                    _, self.player_id, self.seed = WELCOME.unpack(data)
+                    self.road = RoadGenerator(self.seed + self.match)
+                elif data[0] == MSG_SNAPSHOT:
+                    self.handle_snapshot(data)
+                elif data[0] == MSG_LOBBY:
+                    _, match, joined, ready = LOBBY.unpack(data)
+                    if is_newer_match(match, self.match):
+                        self.reset_match(match)
+                    if match == self.match:
+                        self.lobby = (joined, ready)
+            except struct.error:
+                continue
+
+    def handle_snapshot(self, data):
+        _, match, _, base_tick, _, _ = SNAPSHOT_HEADER.unpack_from(data)
+        if is_newer_match(match, self.match):
+            self.reset_match(match)
+        elif match != self.match:
+            return
+        decoded = decode_snapshot(data, self.states)
+        if decoded is None:
+            return
+        _, tick, last_input_seq, players, cars = decoded
+        if tick <= self.latest_tick:
+            return
+        self.started = True
+        # Число полных и дельта-снимков по заездам - для замера
+        self.snapshot_kinds[match, "delta" if base_tick else "full"] += 1
+        self.states[tick] = (players, cars)
+        for old in [t for t in self.states if t <= tick - HISTORY_TICKS]:
+            del self.states[old]
+        self.latest_tick = tick
+        self.render_tick = tick
+        self.server_players = players
+
+        now = time.perf_counter()
+        for seq in [s for s in self.send_times if s <= last_input_seq]:
+            self.latencies.append(now - self.send_times.pop(seq))
+
+        for pid, fields in players.items():
+            if pid != self.player_id:
+                self.remote_history.append((tick, fields[0], fields[2]))
+
+        # Сверка: принимаем состояние сервера и повторяем неподтвержденный ввод
+        me = players.get(self.player_id)
+        if me is None:
+            return
+        before = self.predicted.x
+        self.predicted = NetPlayer(*me)
+        while self.pending and self.pending[0][0] <= last_input_seq:
+            self.pending.popleft()
+        for _, bits in self.pending:
+            self.predicted.apply_input(bits, self.max_speed, self.road)
+        self.corrections.append(abs(self.predicted.x - before))
+
+    @property
+    def road_seed(self):
+        # Сервер начинает каждый новый заезд с зерна seed + match
+        return self.seed + self.match
+
+    @property
+    def road_distance(self):
+        return self.predicted.road_distance
+
+    @property
+    def player_x(self):
+        return self.predicted.x
+
+    @property
+    def player_y(self):
+        return PLAYER_Y
+
+    @property
+    def player_speed(self):
+        return self.predicted.speed
+
+    @property
+    def score(self):
+        me = self.server_players.get(self.player_id)
+        return me[3] if me else 0
+
+    @property
+    def crashed(self):
+        me = self.server_players.get(self.player_id)
+        return bool(me and me[4])
+
+    def car_items(self):
+        # Пары (id машины на сервере, машина в экранных координатах)
+        if not self.latest_tick:
+            return []
+        _, cars = self.states[self.latest_tick]
+        return [(car_id, SimCar(car.x,
+                                PLAYER_Y - (car.distance(self.render_tick) - self.predicted.distance),
+                                car.speed, car.car_type))
+                for car_id, car in cars.items()]
+
+    @property
+    def cars(self):
+        return [car for _, car in self.car_items()]
+
+    @property
+    def remote(self):
+        # Соперник показывается с задержкой, между двумя ближайшими снимками
+        if not self.remote_history:
+            return None
+        target = self.render_tick - INTERPOLATION_TICKS
+        older = self.remote_history[0]
+        for newer in self.remote_history:
+            if newer[0] >= target:
+                break
+            older = newer
+        if newer[0] == older[0]:
+            x, distance = newer[1], newer[2]
+        else:
+            k = min(max((target - older[0]) / (newer[0] - older[0]), 0.0), 1.0)
+            x = older[1] + (newer[1] - older[1]) * k
+            distance = older[2] + (newer[2] - older[2]) * k
+        return x, PLAYER_Y - (distance - self.predicted.distance)
+
+    def close(self):
+        self.sock.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(port, seconds, seed=0, difficulty=1, driver="lane_dodger", loss=0.0, delay=0.0, jitter=0.0):
+    # Два клиента с автопилотом против сервера в отдельном процессе;
+    # возвращает клиентов (счетчики трафика, задержек, коррекций) и длительность
+    from drivers import DRIVERS
+
+    server = Process(target=run_server, args=(port, seed, difficulty),
+                     kwargs={"loss": loss, "delay": delay, "jitter": jitter,
+                             "duration": seconds + 2 * JOIN_TIMEOUT_SECONDS})
+    server.start()
+    time.sleep(0.3)
+    options = {"loss": loss, "delay": delay, "jitter": jitter}
+    clients = [NetClient(("127.0.0.1", port), dict(options, rng=random.Random(i)))
+               for i in range(MAX_PLAYERS)]
+    drive = DRIVERS[driver]
+    rngs = [random.Random(seed + i) for i in range(MAX_PLAYERS)]
+    try:
+        for client in clients:
+            client.join()
+        started = time.perf_counter()
+        next_tick = started
+        while time.perf_counter() - started < seconds:
+            for client, rng in zip(clients, rngs):
+                # Автопилот сразу готов к следующему заезду, как игрок, нажавший «Играть снова»
+                if client.ready_match is None or (client.in_race and client.crashed):
+                    client.request_start()
+                client.update(NET_DT, *drive(client, rng))
+            next_tick += NET_DT
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+        elapsed = time.perf_counter() - started
+    finally:
+        for client in clients:
+            client.close()
+        server.terminate()
+        server.join()
+    return clients, elapsed
+
+
+def run_bench(args):
+    clients, elapsed = measure(args.port, args.seconds, args.seed, args.difficulty, args.driver,
+                               args.loss, args.delay, args.jitter)
+    round_trip = 2 * args.delay + args.jitter
+    print(f"потери {args.loss:.0%}, задержка {args.delay * 1000:.0f} мс "
+          f"+ джиттер до {args.jitter * 1000:.0f} мс в каждую сторону, {elapsed:.0f} с")
+    for i, client in enumerate(clients):
+        latency = [value * 1000 for value in client.latencies]
+        print(f"клиент {i}: вниз {client.bytes_received / elapsed / 1024:.2f} КиБ/с, "
+              f"вверх {client.link.bytes_sent / elapsed / 1024:.2f} КиБ/с, "
+              f"ввод->подтверждение медиана {percentile(latency, 0.5):.1f} мс, "
+              f"p95 {percentile(latency, 0.95):.1f} мс "
+              f"(добавлено сверх сети ~{percentile(latency, 0.5) - round_trip * 1000:.1f} мс), "
+              f"коррекция предсказания max {max(client.corrections, default=0):.2f} px")
+        matches = sorted({match for match, _ in client.snapshot_kinds})
+        print("  снимки по заездам (дельты/полные): " + ", ".join(
+            f"{match}: {client.snapshot_kinds[match, 'delta']}/{client.snapshot_kinds[match, 'full']}"
+            for match in matches))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сетевая игра Dark Racer вдвоем")
+    sub = parser.add_subparsers(dest="command", required=True)
+    server = sub.add_parser("server", help="авторитетный сервер")
+    server.add_argument("--host", default="0.0.0.0")
+    server.add_argument("--port", type=int, default=7777)
+    server.add_argument("--seed", type=int, default=0)
+    server.add_argument("--difficulty", type=int, choices=[0, 1, 2], default=1)
+
+    bench = sub.add_parser("bench", help="замер трафика и задержки через loopback")
+    bench.add_argument("--port", type=int, default=7788)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--difficulty", type=int, choices=[0, 1, 2], default=1)
+    bench.add_argument("--driver", default="lane_dodger")
+    bench.add_argument("--seconds", type=float, default=20.0)
+    bench.add_argument("--loss", type=float, default=0.05, help="доля потерянных пакетов")
+    bench.add_argument("--delay", type=float, default=0.03, help="задержка в одну сторону, с")
+    bench.add_argument("--jitter", type=float, default=0.01, help="разброс задержки, с")
+    args = parser.parse_args()
+
+    if args.command == "server":
+        run_server(args.port, args.seed, args.difficulty, host=args.host)
+    else:
+        run_bench(args)
+
+
+if __name__ == "__main__":
+    main()
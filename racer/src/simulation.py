@@ -0,0 +1,486 @@
+import functools
+import heapq
+import random
+from collections import namedtuple
+
+# Константы игры (общие для окна и безголовой симуляции)
+SCREEN_WIDTH = 600
+SCREEN_HEIGHT = 600
+PLAYER_SPEED_INCREMENT = 0.1
+MAX_PLAYER_SPEED = 25.6
+PLAYER_LATERAL_SPEED = 300
+TRAFFIC_CAR_SPEED_MIN = 5
+TRAFFIC_CAR_SPEED_MAX = 20
+NUM_LANES = 4
+CAR_WIDTH = 60
+CAR_HEIGHT = 98
+SPAWN_INTERVAL_MS = 2000
+SPEED_MODIFIERS = [0.9, 1.0, 1.1]
+ROAD_SPEED_MULTIPLIER = 5
+ROAD_SCROLL_FACTOR = 0.06
+
+# Процедурная дорога: участки по SCREEN_HEIGHT, раскладка полос меняется
+# раз в ROAD_SECTION_CHUNKS участков (сужения и расширения). Полоса не шире
+# ROAD_LANE_WIDTH: четыре полосы занимают весь экран, как в исходной игре
+ROAD_SECTION_CHUNKS = 6
+ROAD_LANE_WIDTH = 150
+ROAD_LANE_CHOICES = [3, 4, 4, 5]
+ROAD_SCENERY = ["signs", "trees", "plain"]
+
+# Генерация трафика заранее, пачками по игровому времени
+SPAWN_BATCH_SECONDS = 10
+SPAWN_LOOKAHEAD_SECONDS = 5
+
+# Авторские волны по уровням сложности: (смещение в секундах, полоса, тип машины)
+WAVE_PATTERNS = {
+    0: [
+        [(0, 0, 0), (0, 3, 0)],
+        [(0, 1, 1), (0.8, 2, 1)],
+    ],
+    1: [
+        [(0, 0, 1), (0, 1, 1), (1.2, 2, 1), (1.2, 3, 1)],
+        [(0, 1, 0), (0, 2, 0)],
+        [(0, 0, 2), (0.6, 1, 2), (1.2, 2, 2)],
+    ],
+    2: [
+        [(0, 0, 2), (0, 1, 2), (0, 2, 2)],
+        [(0, 0, 1), (0.5, 1, 1), (1.0, 2, 1), (1.5, 3, 1)],
+        [(0, 1, 2), (0, 2, 2), (0.9, 0, 1), (0.9, 3, 1)],
+    ],
+}
+WAVE_CHANCE = {0: 0.15, 1: 0.25, 2: 0.35}
+
+# Параметры, которые можно перебирать в пакетной симуляции
+DEFAULT_PARAMS = {
+    "difficulty": 1,
+    "speed_min": TRAFFIC_CAR_SPEED_MIN,
+    "speed_max": TRAFFIC_CAR_SPEED_MAX,
+    "spawn_interval_ms": SPAWN_INTERVAL_MS,
+    "max_player_speed": MAX_PLAYER_SPEED,
+    "speed_modifiers": SPEED_MODIFIERS,
+}
+
+
+def get_traffic_speed(rng, difficulty, base_min=TRAFFIC_CAR_SPEED_MIN,
+                      base_max=TRAFFIC_CAR_SPEED_MAX):
+    if difficulty == 0:
+        return rng.uniform(base_min, base_min + (base_max - base_min) * 0.5)
+    elif difficulty == 1:
+        return rng.uniform(base_min, base_max)
+    else:
+        return rng.uniform(base_min + (base_max - base_min) * 0.5, base_max + 2)
+
+
+def lane_x(lane_index, num_lanes=NUM_LANES):
+    lane_center = (SCREEN_WIDTH / num_lanes) * (lane_index + 0.5)
+    return lane_center - 25
+
+
+# Зазор между низом машины игрока и низом экрана
+PLAYER_BOTTOM_GAP = 20
+
+
+@functools.lru_cache(maxsize=None)
+def road_lane_width(lanes):
+    return min(ROAD_LANE_WIDTH, SCREEN_WIDTH / lanes)
+
+
+@functools.lru_cache(maxsize=None)
+def road_left(lanes):
+    return (SCREEN_WIDTH - lanes * road_lane_width(lanes)) / 2
+
+
+def road_distance_at(t, max_speed=MAX_PLAYER_SPEED):
+    # Пройденный путь дороги к моменту t при автоускорении с нуля
+    accel = PLAYER_SPEED_INCREMENT * 30
+    scale = ROAD_SCROLL_FACTOR * 60
+    accel_time = max_speed / accel
+    if t <= accel_time:
+        return scale * (ROAD_SPEED_MULTIPLIER * t + accel * t * t / 2)
+    return scale * (ROAD_SPEED_MULTIPLIER * t + max_speed * accel_time / 2
+                    + max_speed * (t - accel_time))
+
+
+def move_player(x, speed, dt, left, right, up, down, max_speed=MAX_PLAYER_SPEED,
+                auto_acceleration=True, bounds=(0, SCREEN_WIDTH - CAR_WIDTH)):
+    # bounds - допустимые положения левого края машины (асфальт под ней)
+    if left:
+        x -= PLAYER_LATERAL_SPEED * dt
+    if right:
+        x += PLAYER_LATERAL_SPEED * dt
+    x = min(max(x, bounds[0]), bounds[1])
+
+    if not auto_acceleration:
+        if up:
+            speed = min(max_speed, speed + PLAYER_SPEED_INCREMENT * dt * 60)
+        if down:
+            speed = max(0, speed - PLAYER_SPEED_INCREMENT * dt * 60)
+    else:
+        speed = min(max_speed, speed + PLAYER_SPEED_INCREMENT * dt * 30)
+    return x, speed
+
+
+def rects_intersect(ax, ay, bx, by, width=CAR_WIDTH, height=CAR_HEIGHT):
+    # Та же проверка, что и QRectF.intersects для прямоугольников одного размера
+    return abs(ax - bx) < width and abs(ay - by) < height
+
+
+def spawn_blocked(cars, x):
+    # Спавн пропускается, если полоса у верхнего края занята
+    return any(abs(car.x - x) < 50 and car.y < 150 for car in cars)
+
+
+def road_lane_x(lanes, lane, offset):
+    # Полоса события задана в раскладке из NUM_LANES полос; дробная часть
+    # сдвигает машину внутри широкой полосы, чтобы между полосами
+    # не оставалось мест, куда трафик не попадает никогда
+    position = (lane + offset) / NUM_LANES * lanes
+    index = min(int(position), lanes - 1)
+    width = road_lane_width(lanes)
+    return road_left(lanes) + width * index + (width - CAR_WIDTH) * min(position - index, 1.0)
+
+
+SpawnEvent = namedtuple("SpawnEvent", ["time", "lane", "offset", "x", "car_type", "speed"])
+
+
+class RoadChunk:
+    __slots__ = ("index", "lanes_in", "lanes_out", "left_in", "left_out", "scenery", "props")
+
+    def __init__(self, index, lanes_in, lanes_out, scenery, props):
+        self.index = index
+        self.lanes_in = lanes_in
+        self.lanes_out = lanes_out
+        self.left_in = road_left(lanes_in)
+        self.left_out = road_left(lanes_out)
+        self.scenery = scenery
+        self.props = props
+
+    def lane_x(self, lane_index):
+        return self.left_out + road_lane_width(self.lanes_out) * (lane_index + 0.5) - CAR_WIDTH / 2
+
+    def lane_x_for(self, lane, offset):
+        return road_lane_x(self.lanes_out, lane, offset)
+
+
+# Дорога генерируется по участкам из зерна: любой участок можно получить
+# по индексу, не храня пройденные
+class RoadGenerator:
+    def __init__(self, seed=None):
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.lanes_cache = {}
+
+    def section_lanes(self, section):
+        if section == 0:
+            return NUM_LANES
+        lanes = self.lanes_cache.get(section)
+        if lanes is None:
+            if len(self.lanes_cache) > 256:
+                self.lanes_cache.clear()
+            lanes = random.Random(self.seed * 7919 + section).choice(ROAD_LANE_CHOICES)
+            self.lanes_cache[section] = lanes
+        return lanes
+
+    def chunk_lanes(self, index):
+        section = index // ROAD_SECTION_CHUNKS
+        lanes_out = self.section_lanes(section)
+        if index % ROAD_SECTION_CHUNKS == 0 and section > 0:
+            return self.section_lanes(section - 1), lanes_out
+        return lanes_out, lanes_out
+
+    def chunk(self, index):
+        lanes_in, lanes_out = self.chunk_lanes(index)
+        rng = random.Random(self.seed * 104729 + index)
+        scenery = rng.choice(ROAD_SCENERY)
+        props = [(rng.random() < 0.5, rng.uniform(0, SCREEN_HEIGHT), rng.random())
+                 for _ in range(rng.randint(0, 4))]
+        return RoadChunk(index, lanes_in, lanes_out, scenery, props)
+
+    def chunk_at(self, distance):
+        return self.chunk(int(distance // SCREEN_HEIGHT))
+
+    def left_edge(self, position):
+        # Левый край асфальта; position - координата вдоль дороги,
+        # точка экрана y соответствует road_distance + SCREEN_HEIGHT - y
+        index = int(position // SCREEN_HEIGHT)
+        lanes_in, lanes_out = self.chunk_lanes(index)
+        t = (position - index * SCREEN_HEIGHT) / SCREEN_HEIGHT
+        return road_left(lanes_in) + (road_left(lanes_out) - road_left(lanes_in)) * t
+
+    def player_bounds(self, distance, until=None):
+        # Пределы левого края машины игрока, чтобы она целиком оставалась
+        # на асфальте, пока дорога проходит путь от distance до until
+        start = distance + PLAYER_BOTTOM_GAP
+        end = (distance if until is None else until) + PLAYER_BOTTOM_GAP + CAR_HEIGHT
+        points = [start, end]
+        points += [k * SCREEN_HEIGHT for k in range(int(start // SCREEN_HEIGHT) + 1,
+                                                    int(end // SCREEN_HEIGHT) + 1)]
+        left = max(self.left_edge(p) for p in points)
+        return left, SCREEN_WIDTH - left - CAR_WIDTH
+
+
+def _free_intervals(blockers, low=0, high=SCREEN_WIDTH - CAR_WIDTH):
+    # Допустимые позиции левого края игрока между занятыми интервалами
+    free = []
+    start = low
+    for left, right in sorted(blockers):
+        if left > start:
+            free.append((start, min(left, high)))
+        start = max(start, right)
+        if start >= high:
+            return free
+    free.append((start, high))
+    return free
+
+
+def _clamp(reachable, low, high):
+    # Сужение дороги сдвигает игрока внутрь, как и move_player
+    return [(min(max(left, low), high), min(max(right, low), high)) for left, right in reachable]
+
+
+def _intersect(reachable, free):
+    result = []
+    for left, right in reachable:
+        for free_left, free_right in free:
+            lo, hi = max(left, free_left), min(right, free_right)
+            if lo <= hi:
+                result.append((lo, hi))
+    return result
+
+
+def _spread(reachable, free, distance):
+    # За время между событиями игрок смещается не дальше distance
+    # и только внутри своего свободного промежутка
+    result = []
+    for free_left, free_right in free:
+        inside = _intersect(reachable, [(free_left, free_right)])
+        if inside:
+            result.append((max(free_left, min(l for l, _ in inside) - distance),
+                           min(free_right, max(r for _, r in inside) + distance)))
+    return result
+
+
+# Планировщик спавна по игровому времени. События генерируются пачками
+# в очередь с приоритетом; каждая пачка проверяется на наличие проезда
+# с учетом боковой скорости игрока.
+class SpawnScheduler:
+    def __init__(self, difficulty=1, seed=None, params=None, road=None):
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.difficulty = difficulty
+        self.road = road
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.rng = random.Random(seed)
+        self.queue = []
+        self.sequence = 0
+        self.next_time = self.params["spawn_interval_ms"] / 1000
+        self.generated_until = 0.0
+        self.committed = []
+        self.checkpoint = 0.0
+        start_x = (SCREEN_WIDTH / 2) - (CAR_WIDTH / 2)
+        self.checkpoint_reachable = [(start_x, start_x)]
+
+    def pop_due(self, now):
+        while self.generated_until < now + SPAWN_LOOKAHEAD_SECONDS:
+            self.generate_batch()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            due.append(heapq.heappop(self.queue)[2])
+        return due
+
+    def generate_batch(self):
+        start = self.generated_until
+        end = start + SPAWN_BATCH_SECONDS
+        interval = self.params["spawn_interval_ms"] / 1000
+        patterns = WAVE_PATTERNS.get(self.difficulty, WAVE_PATTERNS[1])
+        batch = []
+
+        t = self.next_time
+        while t < end:
+            if self.rng.random() < WAVE_CHANCE.get(self.difficulty, 0):
+                pattern = self.rng.choice(patterns)
+                mirror = self.rng.random() < 0.5
+                base_speed = self.traffic_speed()
+                for offset, lane, car_type in pattern:
+                    if mirror:
+                        lane = NUM_LANES - 1 - lane
+                    batch.append(SpawnEvent(t + offset, lane, 0.5,
+                                            self.event_x(t + offset, lane, 0.5), car_type,
+                                            base_speed * self.params["speed_modifiers"][car_type]))
+                t += max(offset for offset, _, _ in pattern) + interval
+            else:
+                lane = self.rng.randint(0, NUM_LANES - 1)
+                car_type = self.rng.randint(0, 2)
+                speed = self.traffic_speed() * self.params["speed_modifiers"][car_type]
+                offset = self.rng.random()
+                batch.append(SpawnEvent(t, lane, offset, self.event_x(t, lane, offset),
+                                        car_type, speed))
+                t += interval
+        self.next_time = t
+
+        batch = self.make_passable(batch, end)
+        for event in batch:
+            heapq.heappush(self.queue, (event.time, self.sequence, event))
+            self.sequence += 1
+        self.generated_until = end
+
+    def event_x(self, t, lane, offset):
+        # Полосы берутся с участка, который будет у верхнего края экрана
+        # к моменту спавна (по профилю автоускорения)
+        if self.road is None:
+            return lane_x(lane)
+        distance = road_distance_at(t, self.params["max_player_speed"]) + SCREEN_HEIGHT
+        _, lanes = self.road.chunk_lanes(int(distance // SCREEN_HEIGHT))
+        return road_lane_x(lanes, lane, offset)
+
+    def player_bounds(self, start, end):
+        # Пределы игрока на асфальте за время от start до end (по профилю автоускорения)
+        if self.road is None:
+            return 0, SCREEN_WIDTH - CAR_WIDTH
+        max_speed = self.params["max_player_speed"]
+        return self.road.player_bounds(road_distance_at(start, max_speed),
+                                       road_distance_at(end, max_speed))
+
+    def traffic_speed(self):
+        return get_traffic_speed(self.rng, self.difficulty,
+                                 self.params["speed_min"], self.params["speed_max"])
+
+    def occupancy(self, event):
+        # Когда машина перекрывает ряд игрока. Берется максимальная скорость
+        # игрока: машины подъезжают быстрее всего и времени на маневр меньше.
+        player_y = SCREEN_HEIGHT - CAR_HEIGHT - PLAYER_BOTTOM_GAP
+        closing = (event.speed + self.params["max_player_speed"] * 1.5) * 60
+        enter = event.time + (player_y - CAR_HEIGHT + 80) / closing
+        leave = event.time + (player_y + CAR_HEIGHT + 80) / closing
+        return enter, leave, (event.x - CAR_WIDTH, event.x + CAR_WIDTH)
+
+    def make_passable(self, batch, until):
+        while True:
+            blocking = self.find_blocking(batch, until)
+            if blocking is None:
+                return batch
+            batch.remove(blocking)
+
+    def find_blocking(self, batch, until):
+        windows = [(*self.occupancy(event), event, True) for event in batch]
+        windows += [(*window, event, False) for window, event in self.committed]
+
+        timeline = []
+        blockers = {}
+        for enter, leave, span, event, is_new in windows:
+            if leave <= self.checkpoint:
+                continue
+            if enter <= self.checkpoint:
+                blockers[id(event)] = (span, event, is_new)
+            else:
+                timeline.append((enter, 1, span, event, is_new))
+            timeline.append((leave, 0, span, event, is_new))
+        timeline.append((until, -1, None, None, False))
+        timeline.sort(key=lambda item: (item[0], item[1]))
+
+        now = self.checkpoint
+        low, high = self.player_bounds(now, now)
+        reachable = _clamp(self.checkpoint_reachable, low, high)
+        free = _free_intervals((span for span, _, _ in blockers.values()), low, high)
+        reachable = _intersect(reachable, free)
+        snapshot = None
+        for when, kind, span, event, is_new in timeline:
+            # Между событиями дорога может сузиться: берутся самые узкие пределы
+            low, high = self.player_bounds(now, when)
+            free = _free_intervals((span for span, _, _ in blockers.values()), low, high)
+            reachable = _intersect(_clamp(reachable, low, high), free)
+            reachable = _spread(reachable, free, PLAYER_LATERAL_SPEED * (when - now))
+            now = when
+            if kind == -1:
+                snapshot = reachable
+                continue
+            if kind == 0:
+                blockers.pop(id(event), None)
+            else:
+                blockers[id(event)] = (span, event, is_new)
+            low, high = self.player_bounds(now, now)
+            free = _free_intervals((span for span, _, _ in blockers.values()), low, high)
+            reachable = _intersect(_clamp(reachable, low, high), free)
+            if not reachable:
+                if is_new:
+                    return event
+                new_events = [e for _, e, new in blockers.values() if new]
+                if new_events:
+                    return max(new_events, key=lambda e: e.time)
+                break
+
+        # Пачка проходима: фиксируем состояние на ее конце
+        self.checkpoint = until
+        self.checkpoint_reachable = snapshot or [(0, SCREEN_WIDTH - CAR_WIDTH)]
+        self.committed = [(self.occupancy(event), event) for event in batch] + [
+            (window, event) for window, event in self.committed if window[1] > until]
+        return None
+
+
+class SimCar:
+    __slots__ = ("x", "y", "base_speed", "car_type")
+
+    def __init__(self, x, y, base_speed, car_type):
+        self.x = x
+        self.y = y
+        self.base_speed = base_speed
+        self.car_type = car_type
+
+
+# Правила игры без Qt: игрок, трафик, спавн, столкновения и очки
+class Simulation:
+    def __init__(self, seed=None, params=None, auto_acceleration=True):
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.auto_acceleration = auto_acceleration
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.road = RoadGenerator(seed)
+        self.spawner = SpawnScheduler(self.params["difficulty"], seed, self.params, self.road)
+        self.road_distance = 0.0
+        self.score = 0
+        self.time = 0.0
+        self.crashed = False
+        self.player_x = (SCREEN_WIDTH / 2) - (CAR_WIDTH / 2)
+        self.player_y = SCREEN_HEIGHT - CAR_HEIGHT - PLAYER_BOTTOM_GAP
+        self.player_speed = 0
+        self.cars = []
+
+    def step(self, dt, left=False, right=False, up=False, down=False):
+        if self.crashed:
+            return
+        self.time += dt
+        self.update_player(dt, left, right, up, down)
+        self.update_traffic(dt)
+        self.road_distance += (ROAD_SPEED_MULTIPLIER + self.player_speed) * ROAD_SCROLL_FACTOR * dt * 60
+        for event in self.spawner.pop_due(self.time):
+            self.spawn_traffic_car(event)
+
+    def update_player(self, dt, left, right, up, down):
+        self.player_x, self.player_speed = move_player(
+            self.player_x, self.player_speed, dt, left, right, up, down,
+            self.params["max_player_speed"], self.auto_acceleration,
+            self.road.player_bounds(self.road_distance))
+
+    def update_traffic(self, dt):
+        remaining = []
+        for car in self.cars:
+            car.y += (car.base_speed + self.player_speed * 1.5) * dt * 60
+
+            if car.y > SCREEN_HEIGHT:
+                self.score += 10
+            else:
+                remaining.append(car)
+
+            if rects_intersect(self.player_x, self.player_y, car.x, car.y):
+                self.crashed = True
+        self.cars = remaining
+
+    def spawn_traffic_car(self, event):
+        # Машина появляется там, где ее проверил планировщик (event.x)
+        if not spawn_blocked(self.cars, event.x):
+            self.cars.append(SimCar(event.x, -80, event.speed, event.car_type))
@@ -0,0 +1,227 @@
+import argparse
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+# Длительный прогон игры автопилотом с контролем роста памяти.
+# Пример: python src/soak.py --hours 8 --sample-interval 60 --log soak.log
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from drivers import DRIVERS
+
+GROWTH_WINDOW = 6
+GROWTH_THRESHOLD_BYTES = 1024 * 1024
+
+
+def gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def make_logger(path, max_bytes, backups):
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = gzip_rotator
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger = logging.getLogger("soak")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    return logger
+
+
+def read_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    # На не-Linux системах доступен только пиковый RSS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def qt_object_counts(app, widget):
+    from PyQt6.QtCore import QObject
+
+    # Виджеты попадают в оба списка, поэтому каждый объект считается один раз
+    objects = {id(obj): obj for obj in app.allWidgets()}
+    objects.update((id(obj), obj) for obj in widget.findChildren(QObject))
+    return dict(Counter(type(obj).__name__ for obj in objects.values()))
+
+
+def image_bytes(widget, game):
+    # Память декодированных изображений по ресурсам
+    usage = Counter()
+    for path, image in game.sprite_cache.sources.items():
+        usage[path] += image.sizeInBytes()
+    for (path, _, _), image in game.sprite_cache.scaled.items():
+        usage[path + " (scaled)"] += image.sizeInBytes()
+    for image in widget.road_stream.images.values():
+        usage["road chunks"] += image.sizeInBytes()
+    for name in ("road_image", "scaled_road_image", "scaled_menu_bg", "frame_buffer"):
+        image = getattr(widget, name, None)
+        if image is not None:
+            usage[name] += image.sizeInBytes()
+    return dict(usage)
+
+
+def is_growing(values, threshold):
+    # Монотонный рост на всем окне и заметный прирост
+    window = values[-GROWTH_WINDOW:]
+    if len(window) < GROWTH_WINDOW:
+        return False
+    monotonic = all(b >= a for a, b in zip(window, window[1:]))
+    return monotonic and window[-1] - window[0] >= threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Длительный прогон Dark Racer с контролем памяти")
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--sample-interval", type=float, default=60.0, help="секунд между замерами")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", type=int, choices=[0, 1, 2], default=1)
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="lane_dodger")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--realtime", action="store_true", help="не ускорять игру")
+    parser.add_argument("--size", type=int, default=600, help="сторона кадра в пикселях")
+    parser.add_argument("--log", default="soak.log")
+    parser.add_argument("--log-max-bytes", type=int, default=5 * 1024 * 1024)
+    parser.add_argument("--log-backups", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="мест выделения памяти в отчете")
+    parser.add_argument("--warmup", type=float, default=300.0,
+                        help="секунд прогрева до базового снимка")
+    parser.add_argument("--trace-frames", type=int, default=1, help="глубина стека tracemalloc")
+    args = parser.parse_args()
+
+    logger = make_logger(args.log, args.log_max_bytes, args.log_backups)
+    tracemalloc.start(args.trace_frames)
+
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtGui import QImage
+    from PyQt6.QtWidgets import QApplication, QInputDialog
+    import main as game
+    from export_frames import WidgetDriverView
+
+    # Рекорды пишутся во временный файл, чтобы не трогать настоящую таблицу
+    game.HIGHSCORES_FILE = os.path.join(tempfile.mkdtemp(prefix="racer-soak-"), "highscores.json")
+
+    app = QApplication(sys.argv[:1])
+    widget = game.GameWidget()
+    widget.difficulty = args.difficulty
+    widget.seed = args.seed
+    widget.start_new_game()
+    driver = DRIVERS[args.driver]
+    view = WidgetDriverView(widget)
+    rng = random.Random(args.seed)
+
+    # Диалог рекорда проходит настоящий путь и закрывается автоматически
+    def dismiss_dialogs():
+        dialog = QApplication.activeModalWidget()
+        if isinstance(dialog, QInputDialog):
+            dialog.setTextValue("SOAK")
+            dialog.accept()
+
+    dismisser = QTimer()
+    dismisser.timeout.connect(dismiss_dialogs)
+    dismisser.start(50)
+
+    frame = QImage(args.size, args.size, QImage.Format.Format_ARGB32_Premultiplied)
+    dt = 1.0 / args.fps
+    started = time.monotonic()
+    deadline = started + args.hours * 3600
+    next_sample = started
+    crashed_at = None
+    runs = 1
+    ticks = 0
+
+    baseline = None
+    rss_history = []
+    traced_history = []
+    qt_history = {}
+
+    while time.monotonic() < deadline:
+        tick_started = time.monotonic()
+        if widget.game_state == game.GameState.PLAYING:
+            left, right, up, down = driver(view, rng)
+            widget.left_pressed, widget.right_pressed = left, right
+            widget.up_pressed, widget.down_pressed = up, down
+            widget.update_game_state(dt)
+        elif crashed_at is None:
+            crashed_at = tick_started
+        elif tick_started - crashed_at > 0.3:
+            # Пауза, чтобы успел открыться диалог рекорда
+            widget.seed += 1
+            widget.start_new_game()
+            crashed_at = None
+            runs += 1
+        widget.render_frame(frame)
+        app.processEvents()
+        ticks += 1
+
+        if args.realtime:
+            time.sleep(max(0.0, dt - (time.monotonic() - tick_started)))
+        if tick_started < next_sample:
+            continue
+        next_sample = tick_started + args.sample_interval
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        traced = sum(stat.size for stat in snapshot.statistics("filename"))
+        rss = read_rss()
+        qt_counts = qt_object_counts(app, widget)
+        warming_up = tick_started - started < args.warmup
+
+        logger.info("sample %s", json.dumps({
+            "elapsed": round(tick_started - started, 1),
+            "warmup": warming_up,
+            "ticks": ticks,
+            "runs": runs,
+            "rss": rss,
+            "traced": traced,
+            "qt_objects": qt_counts,
+            "image_bytes": image_bytes(widget, game),
+        }, ensure_ascii=False))
+        if warming_up:
+            continue
+
+        # Рост считается от первого снимка после прогрева
+        if baseline is None:
+            baseline = snapshot
+        rss_history.append(rss)
+        traced_history.append(traced)
+        for name in set(qt_history) | set(qt_counts):
+            qt_history.setdefault(name, []).append(qt_counts.get(name, 0))
+
+        growing = [name for name, values in (("rss", rss_history), ("traced", traced_history))
+                   if is_growing(values, GROWTH_THRESHOLD_BYTES)]
+        growing += [f"qt:{name}" for name, values in qt_history.items() if is_growing(values, 1)]
+        if growing:
+            top = snapshot.compare_to(baseline, "lineno")[:args.top]
+            logger.warning("monotonic growth: %s\n%s", ", ".join(growing),
+                           "\n".join(f"  {stat}" for stat in top))
+
+    dismisser.stop()
+    logger.info("finished: %d ticks, %d runs, rss %d -> %d bytes",
+                ticks, runs, rss_history[0] if rss_history else 0,
+                rss_history[-1] if rss_history else 0)
+
+
+if __name__ == "__main__":
+    main()
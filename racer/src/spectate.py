@@ -0,0 +1,544 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from multiprocessing import Process, Queue
+
+# Трансляция заезда зрителям. Сервер asyncio работает в отдельном потоке
+# процесса игры: каждый тик состояние кодируется один раз и один и тот же
+# набор байт рассылается всем зрителям. Раз в KEYFRAME_INTERVAL тиков уходит
+# ключевой кадр, между ними - дельты. Зритель, который не успевает читать,
+# пропускает дельты до следующего ключевого кадра, а если отстает слишком
+# долго - отключается; игровой цикл при этом никогда не ждет сеть.
+#
+# Протоколы на одном порту:
+#   TCP:       клиент шлет b"RACR", сервер шлет сообщения с длиной "<H" впереди
+#   WebSocket: обычный upgrade, каждое сообщение - бинарный кадр
+#
+# В игре:   python src/main.py --spectate 7790
+# Зритель:  python src/spectate.py watch --port 7790
+# Нагрузка: python src/spectate.py bench --viewers 1000
+
+DEFAULT_PORT = 7790
+KEYFRAME_INTERVAL = 60
+SEND_INTERVAL_TICKS = 3
+SEND_SLICE = 64
+LAG_BUFFER_BYTES = 8 * 1024
+MAX_LAG_TICKS = 300
+SEND_BUFFER_BYTES = 16 * 1024
+HANDSHAKE_TIMEOUT_SECONDS = 5
+TCP_MAGIC = b"RACR"
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+KIND_KEYFRAME, KIND_DELTA = 0, 1
+FIELD_X, FIELD_SPEED, FIELD_SCORE = 1, 2, 4
+
+HEADER = struct.Struct("<BBI")      # вид сообщения, состояние игры, тик
+PLAYER_FIELDS = (struct.Struct("<h"), struct.Struct("<H"), struct.Struct("<I"))  # x, скорость*100, счет
+CAR_COUNT = struct.Struct("<H")     # машин в ключевом кадре
+COUNTS = struct.Struct("<HHH")      # сдвинутые, новые, убранные машины
+MOVED_CAR = struct.Struct("<Hhh")   # номер, x, y
+NEW_CAR = struct.Struct("<HhhB")    # номер, x, y, тип
+CAR_ID = struct.Struct("<H")
+FRAME_LENGTH = struct.Struct("<H")
+
+
+class StateEncoder:
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.tick = 0
+        self.player = None
+        self.cars = {}
+
+    def encode(self, game_state, player_x, player_speed, score, cars):
+        # cars - последовательность (номер, x, y, тип); координаты округляются до пикселя
+        player = (round(player_x), round(player_speed * 100), score)
+        current = {serial & 0xFFFF: (round(x), round(y), car_type)
+                   for serial, x, y, car_type in cars}
+        keyframe = self.tick % self.keyframe_interval == 0
+
+        if keyframe:
+            parts = [HEADER.pack(KIND_KEYFRAME, game_state, self.tick)]
+            parts += [field.pack(value) for field, value in zip(PLAYER_FIELDS, player)]
+            parts.append(CAR_COUNT.pack(len(current)))
+            parts += [NEW_CAR.pack(serial, *car) for serial, car in current.items()]
+        else:
+            mask = 0
+            fields = []
+            for bit, field, old, new in zip((FIELD_X, FIELD_SPEED, FIELD_SCORE), PLAYER_FIELDS,
+                                            self.player, player):
+                if old != new:
+                    mask |= bit
+                    fields.append(field.pack(new))
+            previous = self.cars
+            moved = [MOVED_CAR.pack(serial, x, y) for serial, (x, y, _) in current.items()
+                     if serial in previous and previous[serial][:2] != (x, y)]
+            added = [NEW_CAR.pack(serial, *car) for serial, car in current.items()
+                     if serial not in previous]
+            removed = [CAR_ID.pack(serial) for serial in previous if serial not in current]
+            parts = [HEADER.pack(KIND_DELTA, game_state, self.tick), bytes([mask])]
+            parts += fields
+            parts.append(COUNTS.pack(len(moved), len(added), len(removed)))
+            parts += moved + added + removed
+
+        self.player = player
+        self.cars = current
+        self.tick += 1
+        return keyframe, b"".join(parts)
+
+
+class StateDecoder:
+    def __init__(self):
+        self.tick = None
+        self.game_state = None
+        self.player = None
+        self.cars = {}
+        self.synced = False
+
+    def decode(self, payload):
+        # Возвращает False, если дельту нельзя применить и нужно ждать ключевой кадр
+        kind, game_state, tick = HEADER.unpack_from(payload)
+        offset = HEADER.size
+        if kind == KIND_DELTA and (not self.synced or tick != self.tick + 1):
+            self.synced = False
+            return False
+
+        if kind == KIND_KEYFRAME:
+            player = []
+            for field in PLAYER_FIELDS:
+                player += field.unpack_from(payload, offset)
+                offset += field.size
+            count, = CAR_COUNT.unpack_from(payload, offset)
+            offset += CAR_COUNT.size
+            cars = {}
+            for _ in range(count):
+                serial, x, y, car_type = NEW_CAR.unpack_from(payload, offset)
+                cars[serial] = (x, y, car_type)
+                offset += NEW_CAR.size
+        else:
+            mask = payload[offset]
+            offset += 1
+            player = list(self.player)
+            for i, (bit, field) in enumerate(zip((FIELD_X, FIELD_SPEED, FIELD_SCORE), PLAYER_FIELDS)):
+                if mask & bit:
+                    player[i], = field.unpack_from(payload, offset)
+                    offset += field.size
+            moved, added, removed = COUNTS.unpack_from(payload, offset)
+            offset += COUNTS.size
+            cars = dict(self.cars)
+            for _ in range(moved):
+                serial, x, y = MOVED_CAR.unpack_from(payload, offset)
+                cars[serial] = (x, y, cars[serial][2])
+                offset += MOVED_CAR.size
+            for _ in range(added):
+                serial, x, y, car_type = NEW_CAR.unpack_from(payload, offset)
+                cars[serial] = (x, y, car_type)
+                offset += NEW_CAR.size
+            for _ in range(removed):
+                del cars[CAR_ID.unpack_from(payload, offset)[0]]
+                offset += CAR_ID.size
+
+        self.tick = tick
+        self.game_state = game_state
+        self.player = tuple(player)
+        self.cars = cars
+        self.synced = True
+        return True
+
+
+def websocket_handshake(request):
+    for line in request.decode("latin-1").split("\r\n"):
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sec-websocket-key":
+            accept = base64.b64encode(hashlib.sha1(value.strip().encode() + WS_GUID).digest())
+            return (b"HTTP/1.1 101 Switching Protocols\r\n"
+                    b"Upgrade: websocket\r\n"
+                    b"Connection: Upgrade\r\n"
+                    b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+    raise ValueError("нет заголовка Sec-WebSocket-Key")
+
+
+def websocket_frame(payload):
+    # Бинарный кадр сервер -> клиент, без маски
+    if len(payload) < 126:
+        return bytes((0x82, len(payload))) + payload
+    return struct.pack("!BBH", 0x82, 126, len(payload)) + payload
+
+
+class Viewer:
+    __slots__ = ("writer", "websocket", "lagging_since")
+
+    def __init__(self, writer, websocket):
+        self.writer = writer
+        self.websocket = websocket
+        self.lagging_since = None
+
+
+class SpectatorServer:
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, keyframe_interval=KEYFRAME_INTERVAL):
+        self.host = host
+        self.port = port
+        self.encoder = StateEncoder(keyframe_interval)
+        self.viewers = set()
+        self.backlog = []
+        # Пачки в очереди на отправку: (начинается с ключевого кадра, сообщения)
+        self.pending = []
+        self.tick = 0
+        self.sending = False
+        self.stats = Counter()
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="spectate", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.loop is not None
+
+    def stop(self):
+        loop, self.loop = self.loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self.thread.join()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            server = loop.run_until_complete(
+                asyncio.start_server(self.handle_viewer, self.host, self.port, backlog=1024))
+        except OSError as e:
+            print(f"Ошибка запуска трансляции: {e}")
+            loop.close()
+            self.ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self.loop = loop
+        self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            for viewer in self.viewers:
+                viewer.writer.transport.abort()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+    def publish(self, game_state, player_x, player_speed, score, cars):
+        # Вызывается из игрового цикла: только кодирование и передача в поток asyncio
+        loop = self.loop
+        if loop is None:
+            return
+        keyframe, payload = self.encoder.encode(game_state, player_x, player_speed, score, cars)
+        frames = (FRAME_LENGTH.pack(len(payload)) + payload, websocket_frame(payload))
+        loop.call_soon_threadsafe(self.broadcast, self.encoder.tick - 1, keyframe, frames)
+
+    def broadcast(self, tick, keyframe, frames):
+        # Сообщения копятся и уходят пачкой раз в SEND_INTERVAL_TICKS тиков:
+        # стоимость рассылки - это в основном системный вызов на каждого зрителя.
+        # Ключевой кадр всегда открывает новую пачку, даже во время рассылки
+        self.tick = tick
+        pending = self.pending
+        if keyframe or not pending or len(pending[-1][1]) >= SEND_INTERVAL_TICKS:
+            pending.append((keyframe, []))
+        pending[-1][1].append(frames)
+        self.stats["messages"] += 1
+        self.stats["payload_bytes"] += len(frames[0]) - FRAME_LENGTH.size
+        if self.batch_ready():
+            self.flush()
+
+    def batch_ready(self):
+        # Первая пачка уходит, когда набрана или за ней уже начата следующая
+        pending = self.pending
+        return not self.sending and pending and (
+            len(pending) > 1 or len(pending[0][1]) >= SEND_INTERVAL_TICKS)
+
+    def flush(self):
+        keyframe, messages = self.pending.pop(0)
+        # Дельты, накопленные за время прошлой рассылки, уходят той же пачкой
+        while self.pending and not self.pending[0][0] and (
+                len(self.pending) > 1 or len(self.pending[0][1]) >= SEND_INTERVAL_TICKS):
+            messages += self.pending.pop(0)[1]
+        batch = (b"".join(frames[0] for frames in messages),
+                 b"".join(frames[1] for frames in messages))
+        # Пачки начиная с последнего ключевого кадра - для новых зрителей
+        if keyframe:
+            self.backlog = [batch]
+        elif self.backlog:
+            self.backlog.append(batch)
+        self.sending = True
+        self.stats["batches"] += 1
+        self.send_slice(list(self.viewers), 0, batch, keyframe, self.tick)
+
+    def send_slice(self, viewers, start, batch, keyframe, tick):
+        # Зрители обходятся частями, между ними цикл asyncio отпускает GIL,
+        # и игровой поток не ждет окончания всей рассылки
+        started = time.thread_time()
+        sent = skipped = dropped = 0
+        for viewer in viewers[start:start + SEND_SLICE]:
+            transport = viewer.writer.transport
+            if transport.is_closing():
+                continue
+            if viewer.lagging_since is not None and tick - viewer.lagging_since > MAX_LAG_TICKS:
+                # Зритель давно не читает: отключаем, чтобы не держать его буфер
+                self.viewers.discard(viewer)
+                transport.abort()
+                dropped += 1
+                continue
+            if transport.get_write_buffer_size() > LAG_BUFFER_BYTES or (
+                    viewer.lagging_since is not None and not keyframe):
+                # Отстающий зритель пропускает дельты до следующего ключевого кадра
+                if viewer.lagging_since is None:
+                    viewer.lagging_since = tick
+                skipped += 1
+                continue
+            viewer.lagging_since = None
+            data = batch[viewer.websocket]
+            transport.write(data)
+            sent += len(data)
+
+        stats = self.stats
+        stats["sent_bytes"] += sent
+        stats["skipped"] += skipped
+        stats["dropped"] += dropped
+        stats["broadcast_seconds"] += time.thread_time() - started
+        if start + SEND_SLICE < len(viewers):
+            asyncio.get_running_loop().call_soon(self.send_slice, viewers, start + SEND_SLICE,
+                                                 batch, keyframe, tick)
+        else:
+            self.sending = False
+            if self.batch_ready():
+                self.flush()
+
+    async def handle_viewer(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            # Небольшой буфер ядра, чтобы отставание было видно по буферу транспорта
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+        try:
+            magic = await asyncio.wait_for(reader.readexactly(4), HANDSHAKE_TIMEOUT_SECONDS)
+            if magic == b"GET ":
+                request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                                 HANDSHAKE_TIMEOUT_SECONDS)
+                writer.write(websocket_handshake(request))
+                websocket = True
+            elif magic == TCP_MAGIC:
+                websocket = False
+            else:
+                writer.close()
+                return
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError, ConnectionError):
+            writer.close()
+            return
+
+        # Новый зритель получает последний ключевой кадр и дельты после него
+        viewer = Viewer(writer, websocket)
+        for frames in self.backlog:
+            writer.write(frames[websocket])
+        self.viewers.add(viewer)
+        self.stats["connected"] += 1
+        try:
+            # Входящие данные (ping, close) не нужны, ждем только закрытия
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            writer.close()
+
+
+async def open_viewer(host, port, websocket=False):
+    reader, writer = await asyncio.open_connection(host, port)
+    if websocket:
+        key = base64.b64encode(os.urandom(16))
+        writer.write(b"GET / HTTP/1.1\r\nHost: " + host.encode()
+                     + b"\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     + b"Sec-WebSocket-Key: " + key + b"\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        await reader.readuntil(b"\r\n\r\n")
+    else:
+        writer.write(TCP_MAGIC)
+    return reader, writer
+
+
+async def read_message(reader, websocket):
+    if websocket:
+        _, length = await reader.readexactly(2)
+        if length == 126:
+            length, = struct.unpack("!H", await reader.readexactly(2))
+    else:
+        length, = FRAME_LENGTH.unpack(await reader.readexactly(2))
+    return await reader.readexactly(length)
+
+
+async def watch(host, port):
+    reader, writer = await open_viewer(host, port)
+    decoder = StateDecoder()
+    last_print = 0.0
+    while True:
+        try:
+            payload = await read_message(reader, False)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            print("Трансляция завершена")
+            return
+        if decoder.decode(payload) and time.monotonic() - last_print >= 1.0:
+            last_print = time.monotonic()
+            x, speed, score = decoder.player
+            print(f"тик {decoder.tick}: счет {score}, скорость {speed / 100:.1f}, "
+                  f"x {x}, машин {len(decoder.cars)}")
+
+
+async def bench_viewer(port, websocket, decode, totals):
+    # Читает до закрытия соединения сервером
+    reader, writer = await open_viewer("127.0.0.1", port, websocket)
+    decoder = StateDecoder()
+    received = resyncs = 0
+    try:
+        while True:
+            payload = await read_message(reader, websocket)
+            received += 1
+            if decode and not decoder.decode(payload):
+                resyncs += 1
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    totals["received"].append(received)
+    totals["resyncs"] += resyncs
+
+
+async def stalled_viewer(port, seconds, totals):
+    # Зритель, который подключился и перестал читать
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    sock.send(TCP_MAGIC)
+    await asyncio.sleep(seconds)
+    sock.close()
+
+
+def run_viewers(port, count, stalled, websocket_every, decode_every, seconds, results):
+    async def main():
+        totals = {"received": [], "resyncs": 0}
+        tasks = [asyncio.ensure_future(stalled_viewer(port, seconds, totals)) for _ in range(stalled)]
+        for i in range(count):
+            tasks.append(asyncio.ensure_future(bench_viewer(
+                port, websocket_every and i % websocket_every == 0,
+                i % decode_every == 0, totals)))
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        results.put(totals)
+
+    asyncio.run(main())
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_bench(args):
+    from drivers import DRIVERS
+    from simulation import Simulation
+
+    server = SpectatorServer("127.0.0.1", args.port)
+    if not server.start():
+        return
+    results = Queue()
+    viewers = Process(target=run_viewers, args=(server.port, args.viewers, args.stalled,
+                                                args.websocket_every, args.decode_every,
+                                                args.seconds + 2, results))
+    viewers.start()
+    while server.stats["connected"] < args.viewers + args.stalled and viewers.is_alive():
+        time.sleep(0.05)
+
+    # Игровой цикл: симуляция с автопилотом и публикация каждый тик
+    seed = args.seed
+    sim = Simulation(seed=seed)
+    driver = DRIVERS[args.driver]
+    rng = random.Random(args.seed)
+    serials = {}
+    counter = itertools.count(1)
+    dt = 1.0 / 60
+    publish_times = []
+    lateness = []
+    started = time.perf_counter()
+    next_tick = started
+    while time.perf_counter() - started < args.seconds:
+        if sim.crashed:
+            seed += 1
+            sim.reset(seed)
+        sim.step(dt, *driver(sim, rng))
+        serials = {car: serials.get(car) or next(counter) for car in sim.cars}
+        tick_started = time.perf_counter()
+        server.publish(1, sim.player_x, sim.player_speed, sim.score,
+                       [(serial, car.x, car.y, car.car_type) for car, serial in serials.items()])
+        publish_times.append(time.perf_counter() - tick_started)
+        next_tick += dt
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            lateness.append(-delay)
+    elapsed = time.perf_counter() - started
+    stats = dict(server.stats)
+    server.stop()
+    totals = results.get()
+    viewers.join()
+
+    published = server.encoder.tick
+    received = totals["received"]
+    publish_us = [value * 1e6 for value in publish_times]
+    print(f"{args.viewers} зрителей (+{args.stalled} зависших), {elapsed:.0f} с, "
+          f"{published} сообщений, в среднем {stats['payload_bytes'] / max(1, stats['messages']):.0f} Б")
+    print(f"игровой цикл: publish медиана {percentile(publish_us, 0.5):.0f} мкс, "
+          f"p99 {percentile(publish_us, 0.99):.0f} мкс, max {max(publish_us):.0f} мкс, "
+          f"опозданий тика {len(lateness)}, max {max(lateness, default=0) * 1000:.1f} мс")
+    print(f"поток рассылки: {stats['broadcast_seconds'] / max(1, stats['batches']) * 1e6:.0f} мкс "
+          f"процессорного времени на пачку из {SEND_INTERVAL_TICKS} сообщений, {stats['sent_bytes'] / elapsed / 1024:.0f} КиБ/с всего")
+    print(f"зрители: получено сообщений медиана {percentile(received, 0.5)}, "
+          f"min {min(received, default=0)}, пересинхронизаций {totals['resyncs']}; "
+          f"пропущено отправок {stats['skipped']}, "
+          f"отключено сервером {stats['dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Трансляция заезда Dark Racer зрителям")
+    sub = parser.add_subparsers(dest="command", required=True)
+    viewer = sub.add_parser("watch", help="текстовый зритель")
+    viewer.add_argument("--host", default="127.0.0.1")
+    viewer.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    bench = sub.add_parser("bench", help="нагрузочный замер с локальными зрителями")
+    bench.add_argument("--port", type=int, default=0)
+    bench.add_argument("--viewers", type=int, default=1000)
+    bench.add_argument("--stalled", type=int, default=10, help="зрителей, которые не читают")
+    bench.add_argument("--websocket-every", type=int, default=10,
+                       help="каждый N-й зритель подключается по WebSocket (0 - никто)")
+    bench.add_argument("--decode-every", type=int, default=10,
+                       help="каждый N-й зритель декодирует состояние")
+    bench.add_argument("--seconds", type=float, default=20.0)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--driver", default="lane_dodger")
+    args = parser.parse_args()
+
+    if args.command == "watch":
+        asyncio.run(watch(args.host, args.port))
+    else:
+        run_bench(args)
+
+
+if __name__ == "__main__":
+    main()
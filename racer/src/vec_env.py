@@ -0,0 +1,300 @@
+import heapq
+import time
+
+import numpy as np
+
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_SPEED_INCREMENT, PLAYER_LATERAL_SPEED,
+                        CAR_WIDTH, CAR_HEIGHT, PLAYER_BOTTOM_GAP, ROAD_SPEED_MULTIPLIER,
+                        ROAD_SCROLL_FACTOR, ROAD_LANE_CHOICES, DEFAULT_PARAMS, RoadGenerator,
+                        SpawnScheduler, road_lane_width, road_left)
+
+# Векторизованная среда в стиле Gym для обучения автоматических водителей.
+# Правила совпадают с simulation.Simulation с автоускорением: игрок, трафик
+# и дорога хранятся в массивах NumPy для N игр и шагают одновременно, без Qt.
+# Спавн идет по тому же расписанию SpawnScheduler на процедурной дороге
+# RoadGenerator. Проверка проходимости пачек дорогая, поэтому расписание
+# строится один раз на зерно: игры берут зерна из пула, который
+# генерируется заранее в reset, и общие расписания только читают.
+
+ACTION_NONE = 0
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+NUM_ACTIONS = 3
+
+# Значения на машину в наблюдении: активна, dx, dy, скорость сближения
+CAR_FEATURES = 4
+# Игрок: x, скорость, пределы асфальта слева и справа
+PLAYER_FEATURES = 4
+# Занятость полос: по одному значению на полосу самой широкой раскладки
+MAX_LANES = max(ROAD_LANE_CHOICES)
+
+# Зерен в пуле по умолчанию и сколько секунд расписания строится заранее
+SEED_POOL = 1024
+PREGENERATE_SECONDS = 20
+
+
+class SeedTrack:
+    # Дорога и расписание спавна одного зерна, общие для всех игр с этим зерном
+    def __init__(self, seed, params):
+        self.seed = seed
+        self.road = RoadGenerator(seed)
+        self.spawner = SpawnScheduler(params["difficulty"], seed, params, self.road)
+        # (время, x, скорость) в порядке выхода из очереди планировщика
+        self.events = []
+        # Левый край асфальта снизу и сверху участка и число полос на его выходе
+        self.chunks = []
+
+    def extend(self, until):
+        # События раньше generated_until окончательны: следующая пачка
+        # начинается не раньше конца предыдущей
+        spawner = self.spawner
+        while spawner.generated_until <= until:
+            spawner.generate_batch()
+            queue = spawner.queue
+            while queue and queue[0][0] < spawner.generated_until:
+                event = heapq.heappop(queue)[2]
+                self.events.append((event.time, event.x, event.speed))
+
+    def chunk(self, index):
+        chunks = self.chunks
+        while len(chunks) <= index:
+            lanes_in, lanes_out = self.road.chunk_lanes(len(chunks))
+            chunks.append((road_left(lanes_in), road_left(lanes_out), lanes_out))
+        return chunks[index]
+
+
+class VecRacerEnv:
+    def __init__(self, num_envs, params=None, max_cars=8, dt=0.016, max_steps=None,
+                 seed_pool=SEED_POOL):
+        # seed_pool=None - новое зерно на каждую игру без кэша расписаний (медленно)
+        self.num_envs = num_envs
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.max_cars = max_cars
+        self.dt = dt
+        self.max_steps = max_steps
+        self.seed_pool = seed_pool
+        self.observation_size = PLAYER_FEATURES + MAX_LANES + max_cars * CAR_FEATURES
+        self.action_count = NUM_ACTIONS
+
+        self.player_y = SCREEN_HEIGHT - CAR_HEIGHT - PLAYER_BOTTOM_GAP
+
+        shape = (num_envs, max_cars)
+        self.player_x = np.empty(num_envs)
+        self.player_speed = np.empty(num_envs)
+        self.score = np.empty(num_envs, dtype=np.int64)
+        self.steps = np.empty(num_envs, dtype=np.int64)
+        self.time = np.empty(num_envs)
+        self.road_distance = np.empty(num_envs)
+        self.seeds = np.zeros(num_envs, dtype=np.int64)
+        self.car_x = np.zeros(shape)
+        self.car_y = np.zeros(shape)
+        self.car_speed = np.zeros(shape)
+        self.car_active = np.zeros(shape, dtype=bool)
+        self.obs = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self.rng = np.random.default_rng()
+
+        # Следующее событие расписания каждой игры
+        self.tracks = [None] * num_envs
+        self.cursor = np.zeros(num_envs, dtype=np.int64)
+        self.next_time = np.zeros(num_envs)
+        self.next_x = np.zeros(num_envs)
+        self.next_speed = np.zeros(num_envs)
+        self.pool = []
+        self.pool_tracks = {}
+
+        # Левый край асфальта на участке под игроком и на следующем:
+        # (снизу, сверху) для каждого из двух участков
+        self.edge_chunk = np.zeros(num_envs, dtype=np.int64)
+        self.edges = np.zeros((num_envs, 4))
+        self.bound_low = np.zeros(num_envs)
+        self.bound_high = np.zeros(num_envs)
+        # Раскладка полос участка под игроком для занятости полос
+        self.lanes = np.zeros(num_envs, dtype=np.int64)
+        self.lane_left = np.zeros(num_envs)
+        self.lane_width = np.ones(num_envs)
+        self.lane_base = np.arange(num_envs)[:, None] * MAX_LANES
+        self.occupancy = np.zeros(num_envs * MAX_LANES, dtype=np.float32)
+
+    def reset(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        if self.seed_pool:
+            # Расписания на первые PREGENERATE_SECONDS строятся здесь, а не в step
+            self.pool = [int(s) for s in self.rng.integers(2 ** 31, size=self.seed_pool)]
+            self.pool_tracks = {s: self.pool_tracks.get(s) or SeedTrack(s, self.params)
+                                for s in self.pool}
+            for track in self.pool_tracks.values():
+                track.extend(PREGENERATE_SECONDS)
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._observe()
+
+    def _reset_envs(self, mask):
+        self.player_x[mask] = (SCREEN_WIDTH / 2) - (CAR_WIDTH / 2)
+        self.player_speed[mask] = 0
+        self.score[mask] = 0
+        self.steps[mask] = 0
+        self.time[mask] = 0
+        self.road_distance[mask] = 0
+        self.car_active[mask] = False
+        self.cursor[mask] = 0
+        for env in np.flatnonzero(mask):
+            if self.pool:
+                track = self.pool_tracks[self.pool[self.rng.integers(len(self.pool))]]
+            else:
+                track = SeedTrack(int(self.rng.integers(2 ** 31)), self.params)
+            self.tracks[env] = track
+            self.seeds[env] = track.seed
+            self._load_event(env)
+            self._load_edges(env, 0)
+        self._update_bounds()
+
+    def _load_event(self, env):
+        # Событие под курсором; за концом расписания - его конец, там оно достраивается
+        track = self.tracks[env]
+        cursor = self.cursor[env]
+        if cursor < len(track.events):
+            self.next_time[env], self.next_x[env], self.next_speed[env] = track.events[cursor]
+        else:
+            self.next_time[env] = track.spawner.generated_until
+            self.next_speed[env] = np.nan
+
+    def _load_edges(self, env, index):
+        track = self.tracks[env]
+        self.edge_chunk[env] = index
+        self.edges[env, :2] = track.chunk(index)[:2]
+        self.edges[env, 2:] = track.chunk(index + 1)[:2]
+        lanes = track.chunk(index)[2]
+        self.lanes[env] = lanes
+        self.lane_left[env] = road_left(lanes)
+        self.lane_width[env] = road_lane_width(lanes)
+
+    def _update_bounds(self):
+        # То же, что RoadGenerator.player_bounds: асфальт под всей длиной машины.
+        # Машина короче участка, поэтому она лежит не больше чем на двух участках
+        start = self.road_distance + PLAYER_BOTTOM_GAP
+        index = (start // SCREEN_HEIGHT).astype(np.int64)
+        for env in np.flatnonzero(index != self.edge_chunk):
+            self._load_edges(env, int(index[env]))
+
+        base = index * SCREEN_HEIGHT
+        end = start + CAR_HEIGHT
+        edges = self.edges
+        left = edges[:, 0] + (edges[:, 1] - edges[:, 0]) * (start - base) / SCREEN_HEIGHT
+        crossing = end >= base + SCREEN_HEIGHT
+        in_first = edges[:, 0] + (edges[:, 1] - edges[:, 0]) * (end - base) / SCREEN_HEIGHT
+        in_second = edges[:, 2] + (edges[:, 3] - edges[:, 2]) * (end - base - SCREEN_HEIGHT) / SCREEN_HEIGHT
+        left = np.maximum(left, np.where(crossing, np.maximum(in_second, edges[:, 1]), in_first))
+        self.bound_low[:] = left
+        self.bound_high[:] = SCREEN_WIDTH - left - CAR_WIDTH
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        dt = self.dt
+        self.steps += 1
+        self.time += dt
+
+        # Игрок: боковое смещение в пределах асфальта и автоускорение
+        direction = (actions == ACTION_RIGHT).astype(np.float64) - (actions == ACTION_LEFT)
+        self.player_x += direction * (PLAYER_LATERAL_SPEED * dt)
+        np.minimum(np.maximum(self.player_x, self.bound_low), self.bound_high, out=self.player_x)
+        self.player_speed += PLAYER_SPEED_INCREMENT * dt * 30
+        np.minimum(self.player_speed, self.params["max_player_speed"], out=self.player_speed)
+
+        # Трафик: движение, обгоны и столкновения
+        self.car_y += (self.car_speed + self.player_speed[:, None] * 1.5) * (dt * 60)
+        passed = self.car_active & (self.car_y > SCREEN_HEIGHT)
+        rewards = passed.sum(axis=1) * 10
+        self.score += rewards
+        hit = (self.car_active
+               & (np.abs(self.car_x - self.player_x[:, None]) < CAR_WIDTH)
+               & (np.abs(self.car_y - self.player_y) < CAR_HEIGHT))
+        crashed = hit.any(axis=1)
+        self.car_active &= ~passed
+
+        # Дорога и спавн по расписанию; пределы асфальта - к следующему шагу
+        self.road_distance += (ROAD_SPEED_MULTIPLIER + self.player_speed) * ROAD_SCROLL_FACTOR * dt * 60
+        due = np.flatnonzero(self.time >= self.next_time)
+        while len(due):
+            # По одному событию на игру за проход: машины волны с одним временем
+            # появляются по очереди и видят друг друга, как в Simulation
+            self._spawn(due)
+            due = due[self.time[due] >= self.next_time[due]]
+        self._update_bounds()
+
+        dones = crashed
+        if self.max_steps is not None:
+            dones = dones | (self.steps >= self.max_steps)
+        infos = {"score": self.score.copy(), "crashed": crashed}
+        if dones.any():
+            self._reset_envs(dones)
+
+        return self._observe(), rewards, dones, infos
+
+    def _spawn(self, envs):
+        # Пустое место в расписании (скорость nan): его нужно достроить
+        spawning = envs[~np.isnan(self.next_speed[envs])]
+        x_pos = self.next_x[spawning]
+
+        # Как simulation.spawn_blocked: спавн пропускается, если полоса у верхнего края занята
+        active = self.car_active[spawning]
+        blocked = (active
+                   & (np.abs(self.car_x[spawning] - x_pos[:, None]) < 50)
+                   & (self.car_y[spawning] < 150)).any(axis=1)
+        slots = np.argmin(active, axis=1)
+        ok = ~active[np.arange(len(spawning)), slots] & ~blocked  # иначе все max_cars мест заняты
+
+        placed, slots = spawning[ok], slots[ok]
+        self.car_x[placed, slots] = x_pos[ok]
+        self.car_y[placed, slots] = -80
+        self.car_speed[placed, slots] = self.next_speed[placed]
+        self.car_active[placed, slots] = True
+
+        self.cursor[spawning] += 1
+        for env in envs:
+            track = self.tracks[env]
+            if self.cursor[env] >= len(track.events):
+                track.extend(self.time[env])
+            self._load_event(env)
+
+    def _observe(self):
+        obs = self.obs
+        active = self.car_active
+        obs[:, 0] = self.player_x / SCREEN_WIDTH
+        obs[:, 1] = self.player_speed / self.params["max_player_speed"]
+        obs[:, 2] = self.bound_low / SCREEN_WIDTH
+        obs[:, 3] = self.bound_high / SCREEN_WIDTH
+
+        # Занятость полос по раскладке участка под игроком: машина видна
+        # на экране и ее центр над полосой
+        center = self.car_x + (CAR_WIDTH / 2 - self.lane_left[:, None])
+        lane = np.minimum(np.floor(center / self.lane_width[:, None]), self.lanes[:, None] - 1)
+        visible = active & (self.car_y > -CAR_HEIGHT) & (lane >= 0)
+        occupancy = self.occupancy
+        occupancy[:] = 0
+        occupancy[(self.lane_base + lane.astype(np.int64))[visible]] = 1
+        obs[:, PLAYER_FEATURES:PLAYER_FEATURES + MAX_LANES] = occupancy.reshape(self.num_envs, MAX_LANES)
+
+        cars = obs[:, PLAYER_FEATURES + MAX_LANES:].reshape(self.num_envs, self.max_cars, CAR_FEATURES)
+        cars[:, :, 0] = active
+        cars[:, :, 1] = (self.car_x - self.player_x[:, None]) / SCREEN_WIDTH * active
+        cars[:, :, 2] = (self.car_y - self.player_y) / SCREEN_HEIGHT * active
+        closing_speed = self.car_speed + self.player_speed[:, None] * 1.5
+        cars[:, :, 3] = closing_speed / SCREEN_HEIGHT * active
+        return obs.copy()
+
+
+if __name__ == "__main__":
+    # Замер пропускной способности: 1000 сред в одном процессе
+    env = VecRacerEnv(1000, max_steps=10000)
+    started = time.perf_counter()
+    env.reset(seed=0)
+    print(f"reset с расписаниями для {env.seed_pool} зерен: {time.perf_counter() - started:.2f} с")
+    rng = np.random.default_rng(1)
+    actions = rng.integers(0, NUM_ACTIONS, (256, env.num_envs))
+    steps = 2000
+    started = time.perf_counter()
+    for i in range(steps):
+        env.step(actions[i % len(actions)])
+    elapsed = time.perf_counter() - started
+    print(f"{steps * env.num_envs / elapsed:,.0f} шагов сред/с")
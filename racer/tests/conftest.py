@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули игры импортируются как скрипты из src, без пакета
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
@@ -0,0 +1,19 @@
+import math
+
+import pytest
+
+from batch_sim import MAX_CHUNK_SIZE, chunk_size_for, parse_grid
+
+
+@pytest.mark.parametrize("games, workers", [(10000, 1), (10000, 8), (10000, 64), (100, 32), (10 ** 6, 4)])
+def test_chunks_keep_every_worker_busy(games, workers):
+    chunk_size = chunk_size_for(games, workers)
+    assert 1 <= chunk_size <= MAX_CHUNK_SIZE
+    assert math.ceil(games / chunk_size) >= min(games, workers)
+
+
+def test_speed_modifiers_grid():
+    grid = parse_grid(["speed_modifiers=0.9:1.0:1.1,0.8:1.0:1.2", "difficulty=0,2"])
+    assert grid == {"speed_modifiers": [[0.9, 1.0, 1.1], [0.8, 1.0, 1.2]], "difficulty": [0, 2]}
+    with pytest.raises(SystemExit):
+        parse_grid(["speed_modifiers=0.9:1.0"])
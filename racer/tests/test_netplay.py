@@ -0,0 +1,182 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from netplay import (NET_DT, DuelWorld, NetClient, decode_snapshot, encode_snapshot, measure, pack_input,
+                     percentile, run_server)
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_world(ticks):
+    world = DuelWorld(seed=3)
+    world.add_player(0)
+    world.add_player(1)
+    step_world(world, ticks)
+    return world
+
+
+def step_world(world, ticks):
+    for _ in range(ticks):
+        world.apply_input(0, pack_input(world.tick % 90 < 10, False, False, False))
+        world.apply_input(1, pack_input(False, world.tick % 70 < 8, False, False))
+        world.step()
+
+
+def assert_matches_world(players, cars, world):
+    # x, скорость и дорога передаются как float32
+    for pid, fields in world.snapshot()[0].items():
+        assert players[pid] == pytest.approx(fields, abs=1e-3)
+    assert set(cars) == set(world.cars)
+    for car_id, car in world.cars.items():
+        got = cars[car_id]
+        assert (got.x, got.start_distance, got.speed, got.car_type, got.spawn_tick) == pytest.approx(
+            (car.x, car.start_distance, car.speed, car.car_type, car.spawn_tick), abs=1e-3)
+
+
+def test_full_snapshot_round_trip():
+    world = make_world(600)
+    assert world.cars
+    match, tick, last_input_seq, players, cars = decode_snapshot(
+        encode_snapshot(world, 7, 0, None, 42), {})
+    assert (match, tick, last_input_seq) == (7, world.tick, 42)
+    assert_matches_world(players, cars, world)
+
+
+def test_delta_snapshot_round_trip():
+    world = make_world(300)
+    base_tick = world.tick
+    base = world.snapshot()
+    states = {base_tick: decode_snapshot(encode_snapshot(world, 0, 0, None, 0), {})[3:]}
+    step_world(world, 120)
+
+    full = encode_snapshot(world, 0, 0, None, 5)
+    delta = encode_snapshot(world, 0, base_tick, base, 5)
+    assert len(delta) < len(full)
+    _, tick, _, players, cars = decode_snapshot(delta, states)
+    assert tick == world.tick
+    assert_matches_world(players, cars, world)
+
+
+def test_delta_against_unknown_base_is_skipped():
+    world = make_world(60)
+    base = world.snapshot()
+    step_world(world, 10)
+    assert decode_snapshot(encode_snapshot(world, 0, 60, base, 0), {}) is None
+
+
+def test_truncated_snapshot_raises_struct_error():
+    data = encode_snapshot(make_world(600), 0, 0, None, 0)
+    for length in range(len(data)):
+        with pytest.raises(struct.error):
+            decode_snapshot(data[:length], {})
+
+
+def test_client_ignores_malformed_packets():
+    client = NetClient(("127.0.0.1", free_port()))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for packet in (b"", b"\x01", b"\x01\x00", b"\x03", b"\x03\x00\x01", b"\xff"):
+            sock.sendto(packet, ("127.0.0.1", client.sock.getsockname()[1]))
+        time.sleep(0.05)
+        client.poll()
+    assert client.player_id is None
+    assert client.latest_tick == 0
+    client.close()
+
+
+def test_server_survives_malformed_packets():
+    port = free_port()
+    server = threading.Thread(target=run_server, args=(port,), kwargs={"duration": 3}, daemon=True)
+    server.start()
+    time.sleep(0.2)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for packet in (b"", b"\x02", b"\x00", b"\x02\x01", b"\x02\x00\x00\x00\x00\x07", b"\x04",
+                       b"\xff"):
+            sock.sendto(packet, ("127.0.0.1", port))
+        time.sleep(0.1)
+
+    client = NetClient(("127.0.0.1", port))
+    client.join()
+    deadline = time.perf_counter() + 1
+    while client.lobby == (0, 0) and time.perf_counter() < deadline:
+        client.update(0.016, False, False, False, False)
+        time.sleep(0.016)
+    client.close()
+    assert server.is_alive()
+    # b"\x00" - настоящий JOIN: отправитель мусора тоже стал игроком
+    assert client.lobby == (2, 0)
+    server.join()
+
+
+def test_race_starts_when_both_players_are_ready():
+    port = free_port()
+    server = threading.Thread(target=run_server, args=(port,), kwargs={"duration": 4}, daemon=True)
+    server.start()
+    time.sleep(0.2)
+    first, second = NetClient(("127.0.0.1", port)), NetClient(("127.0.0.1", port))
+
+    def run(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for client in (first, second):
+                client.update(NET_DT, False, True, False, False)
+            time.sleep(NET_DT)
+
+    first.join()
+    second.join()
+    first.request_start()
+    # Один игрок в меню: сервер не начинает заезд и не двигает готового
+    run(1)
+    assert first.lobby == (2, 1)
+    assert not first.in_race and not first.started and not second.started
+
+    second.request_start()
+    run(0.5)
+    first.close()
+    second.close()
+    server.join()
+    assert first.in_race and second.in_race
+    # Оба стартовали одновременно с нулевой дистанции
+    assert first.predicted.distance == pytest.approx(second.predicted.distance, rel=0.1)
+    assert first.predicted.distance < 60
+
+
+def test_cars_are_culled_behind_last_alive_player():
+    world = DuelWorld(seed=0)
+    world.add_player(0)
+    world.add_player(1)
+    world.players[1].crashed = True
+    held = []
+    for _ in range(120 * 60):
+        world.apply_input(0, 0)
+        world.step()
+        # Выживший игрок бессмертен, чтобы заезд шел все две минуты
+        world.players[0].crashed = False
+        held.append(len(world.cars))
+    assert max(held) < 15
+
+
+def test_bandwidth_and_latency_over_lossy_link():
+    # Случайный водитель разбивается за секунды: замер захватывает перезапуски заезда
+    loss, delay, jitter = 0.05, 0.03, 0.01
+    clients, elapsed = measure(free_port(), 20, driver="random", loss=loss, delay=delay, jitter=jitter)
+    round_trip = 2 * delay + jitter
+    for client in clients:
+        matches = sorted({match for match, _ in client.snapshot_kinds})
+        assert len(matches) >= 2
+        # После перезапуска сервер по-прежнему шлет дельты, а не полные снимки
+        for match in matches[:-1]:
+            kinds = client.snapshot_kinds
+            assert kinds[match, "delta"] > 10 * kinds[match, "full"]
+        assert client.bytes_received / elapsed / 1024 < 4.0
+        assert client.link.bytes_sent / elapsed / 1024 < 1.5
+        # Сверх сети: ожидание тика сервера и отправки ввода
+        assert percentile(client.latencies, 0.5) - round_trip < 0.06
+        assert percentile(client.corrections, 0.5) < 0.01
@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import pytest
+
+from simulation import (CAR_WIDTH, PLAYER_LATERAL_SPEED, SCREEN_WIDTH, RoadGenerator, SpawnEvent,
+                        SpawnScheduler)
+
+CHECK_SECONDS = 60
+CHECK_DT = 1 / 200
+# Запас в пикселях на шаг сетки: касание машин бортами не считается стеной
+TOLERANCE = 1
+
+
+def first_wall(scheduler, events, until):
+    # Независимая проверка на сетке позиций с шагом в пиксель и времени
+    # с шагом CHECK_DT: где может быть левый край игрока, если он смещается
+    # не быстрее PLAYER_LATERAL_SPEED. Возвращает момент, когда мест не осталось
+    windows = np.array([scheduler.occupancy(event)[:2] + scheduler.occupancy(event)[2]
+                        for event in events]).reshape(-1, 4)
+    positions = np.arange(SCREEN_WIDTH - CAR_WIDTH + 1)
+    reach = positions == (SCREEN_WIDTH - CAR_WIDTH) // 2
+    step = math.ceil(PLAYER_LATERAL_SPEED * CHECK_DT)
+    for tick in range(1, int(until / CHECK_DT)):
+        t = tick * CHECK_DT
+        # Смещение за шаг
+        spread = reach.copy()
+        for shift in range(1, step + 1):
+            spread[shift:] |= reach[:-shift]
+            spread[:-shift] |= reach[shift:]
+        # Сужение дороги сдвигает игрока внутрь
+        low, high = scheduler.player_bounds(t, t)
+        low, high = math.ceil(low), math.floor(high)
+        inside = spread[low:high + 1].copy()
+        inside[0] |= spread[:low].any()
+        inside[-1] |= spread[high + 1:].any()
+        reach = np.zeros_like(reach)
+        reach[low:high + 1] = inside
+        active = windows[(windows[:, 0] <= t) & (t < windows[:, 1])]
+        for left, right in active[:, 2:]:
+            reach &= (positions <= left + TOLERANCE) | (positions >= right - TOLERANCE)
+        if not reach.any():
+            return t
+    return None
+
+
+@pytest.mark.parametrize("difficulty", [0, 1, 2])
+@pytest.mark.parametrize("seed", range(4))
+def test_spawn_batches_leave_a_path(difficulty, seed):
+    scheduler = SpawnScheduler(difficulty, seed, None, RoadGenerator(seed))
+    assert first_wall(scheduler, scheduler.pop_due(CHECK_SECONDS), CHECK_SECONDS) is None
+
+
+def test_wall_is_broken_up():
+    # Шесть машин через 100 px перекрывают всю ширину дороги
+    scheduler = SpawnScheduler(2, 0)
+    wall = [SpawnEvent(2.0, 0, 0.0, x, 0, 10.0) for x in range(0, SCREEN_WIDTH, 100)]
+    assert first_wall(scheduler, wall, 5) is not None
+
+    passable = scheduler.make_passable(list(wall), 5)
+    assert len(passable) < len(wall)
+    assert first_wall(scheduler, passable, 5) is None
@@ -0,0 +1,33 @@
+from spectate import KEYFRAME_INTERVAL, SEND_INTERVAL_TICKS, SpectatorServer, StateDecoder, StateEncoder
+
+
+def test_round_trip_with_more_than_255_cars():
+    encoder = StateEncoder(keyframe_interval=2)
+    decoder = StateDecoder()
+    cars = [(serial, serial % 500, -80 + serial, serial % 3) for serial in range(300)]
+    for tick in range(4):
+        # Каждый тик все машины сдвигаются, половина заменяется новыми
+        if tick:
+            cars = [(serial + 150 * (serial % 2), x + 1, y + 7, car_type)
+                    for serial, x, y, car_type in cars]
+        _, payload = encoder.encode(1, 170.4, 3.25, 10 * tick, cars)
+        assert decoder.decode(payload)
+        assert decoder.player == (170, 325, 10 * tick)
+        assert decoder.cars == {serial: (x, y, car_type) for serial, x, y, car_type in cars}
+
+
+def test_keyframe_starts_new_batch_while_sending():
+    server = SpectatorServer()
+    server.sending = True
+    tick = KEYFRAME_INTERVAL - 2
+    for tick in range(tick, tick + 2 + SEND_INTERVAL_TICKS):
+        keyframe = tick % KEYFRAME_INTERVAL == 0
+        server.broadcast(tick, keyframe, (b"%d" % tick, b"%d" % tick))
+    assert [(keyframe, len(messages)) for keyframe, messages in server.pending] == [
+        (False, 2), (True, SEND_INTERVAL_TICKS)]
+
+    # Окончание рассылки: дельты и пачка с ключевым кадром уходят по отдельности
+    server.send_slice([], 0, (b"", b""), False, tick)
+    assert server.pending == [] and not server.sending
+    assert server.stats["batches"] == 2
+    assert server.backlog == [(b"606162", b"606162")]
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+import vec_env
+from drivers import DRIVERS
+from simulation import CAR_WIDTH, SCREEN_HEIGHT, Simulation, road_lane_width, road_left
+from vec_env import ACTION_LEFT, ACTION_NONE, ACTION_RIGHT, MAX_LANES, PLAYER_FEATURES, VecRacerEnv
+
+
+def test_env_matches_simulation_step_for_step(monkeypatch):
+    # Без заранее построенных расписаний: все пачки достраиваются внутри step
+    monkeypatch.setattr(vec_env, "PREGENERATE_SECONDS", 0)
+    env = VecRacerEnv(4, max_cars=32, seed_pool=4)
+    env.reset(seed=5)
+    sims = [Simulation(seed=int(seed)) for seed in env.seeds]
+    rngs = [random.Random(i) for i in range(len(sims))]
+    finished = [False] * len(sims)
+    for _ in range(60 * 60):
+        actions = []
+        for sim, rng in zip(sims, rngs):
+            left, right, _, _ = DRIVERS["lane_dodger"](sim, rng)
+            action = ACTION_LEFT if left else ACTION_RIGHT if right else ACTION_NONE
+            sim.step(env.dt, action == ACTION_LEFT, action == ACTION_RIGHT)
+            actions.append(action)
+        _, _, dones, infos = env.step(actions)
+
+        for i, sim in enumerate(sims):
+            if finished[i]:
+                continue
+            assert dones[i] == sim.crashed
+            assert infos["score"][i] == sim.score
+            if dones[i]:
+                finished[i] = True
+                continue
+            assert env.player_x[i] == pytest.approx(sim.player_x, abs=1e-6)
+            assert env.road_distance[i] == pytest.approx(sim.road_distance)
+            active = env.car_active[i]
+            got = np.array(sorted(zip(env.car_x[i][active], env.car_y[i][active]))).reshape(-1, 2)
+            want = np.array(sorted((car.x, car.y) for car in sim.cars)).reshape(-1, 2)
+            assert got.shape == want.shape and np.allclose(got, want)
+        if all(finished):
+            break
+    # Хотя бы одна игра пережила несколько пачек расписания
+    assert max(sim.time for sim in sims) > 25
+
+
+@pytest.mark.parametrize("lanes", [3, 4, 5])
+def test_lane_occupancy_follows_chunk_layout(lanes):
+    env = VecRacerEnv(1, seed_pool=1)
+    env.reset(seed=0)
+    road = env.tracks[0].road
+    index = next(i for i in range(1, 10000) if road.chunk_lanes(i) == (lanes, lanes))
+    env.road_distance[0] = index * SCREEN_HEIGHT
+    env._update_bounds()
+
+    # По машине в каждой нечетной полосе
+    occupied = list(range(1, lanes, 2))
+    width = road_lane_width(lanes)
+    for slot, lane in enumerate(occupied):
+        env.car_x[0, slot] = road_left(lanes) + width * (lane + 0.5) - CAR_WIDTH / 2
+        env.car_y[0, slot] = 100
+        env.car_active[0, slot] = True
+    occupancy = env._observe()[0, PLAYER_FEATURES:PLAYER_FEATURES + MAX_LANES]
+    assert list(np.flatnonzero(occupancy)) == occupied
+    assert env.bound_low[0] == pytest.approx(road_left(lanes))